@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+离线基准测试：启动本地模拟服务，端到端运行 WeixinCrawler，统计吞吐量、各阶段耗时、CPU 时间和内存峰值
+结果以 JSON Lines 追加到结果文件，便于跨版本对比
+
+    python bench/benchmark.py --accounts 4 --max-articles 50 --latency 80 --rate 20 --workers 8
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from weixin import WeixinCrawler  # noqa: E402
+
+
+def start_mock_server(args: argparse.Namespace) -> subprocess.Popen:
+    """在子进程中启动模拟服务，避免服务端的 CPU 时间计入爬虫"""
+    cmd = [
+        sys.executable, str(BENCH_DIR / 'mock_server.py'),
+        '--port', '0',
+        '--articles', str(args.articles_per_account),
+        '--latency', str(args.latency),
+        '--jitter', str(args.jitter),
+        '--error-rate', str(args.error_rate),
+    ]
+    if args.server_rate_limit:
+        cmd += ['--rate-limit', str(args.server_rate_limit)]
+    if args.login_rate_limit:
+        cmd += ['--login-rate-limit', str(args.login_rate_limit)]
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return ''
+
+
+def cpu_seconds() -> float:
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict:
+    server = start_mock_server(args)
+    try:
+        base_url = server.stdout.readline().strip()
+        accounts = [f'测试公众号{i}' for i in range(args.accounts)]
+        with tempfile.TemporaryDirectory() as work_dir:
+            cookie_files = []
+            for i in range(args.credentials):
+                cookie_file = Path(work_dir) / f'account_cookie_{i}.txt'
+                cookie_file.write_text(json.dumps({'slave_sid': f'bench{i}'}), encoding='utf-8')
+                cookie_files.append(str(cookie_file))
+            crawler = WeixinCrawler(
+                accounts,
+                chrome_driver_path='unused',
+                max_articles=args.max_articles,
+                workers=args.workers,
+                rate=args.rate,
+                account_workers=args.account_workers,
+                convert_workers=args.convert_workers,
+                extractor=args.extractor,
+                search_rate=args.rate,
+                state_file=None,
+                fakeid_cache_file=None,
+                output_format=args.output_format,
+                output_dir=work_dir,
+                base_url=base_url,
+                cookie_files=cookie_files,
+                credential_rate=args.credential_rate,
+                max_retries=args.max_retries,
+                asset_dir=str(Path(work_dir) / 'assets') if args.assets else None,
+            )
+            cpu_start = cpu_seconds()
+            wall_start = time.perf_counter()
+            crawler.run()
+            wall = time.perf_counter() - wall_start
+            cpu = cpu_seconds() - cpu_start
+    finally:
+        server.terminate()
+        server.wait()
+
+    articles = crawler.metrics.counter('articles_total')
+    return {
+        'timestamp': int(time.time()),
+        'revision': git_revision(),
+        'label': args.label,
+        'config': {
+            'accounts': args.accounts,
+            'max_articles': args.max_articles,
+            'latency_ms': args.latency,
+            'jitter_ms': args.jitter,
+            'error_rate': args.error_rate,
+            'server_rate_limit': args.server_rate_limit,
+            'login_rate_limit': args.login_rate_limit,
+            'credentials': args.credentials,
+            'credential_rate': args.credential_rate,
+            'rate': args.rate,
+            'workers': args.workers,
+            'account_workers': args.account_workers,
+            'convert_workers': args.convert_workers,
+            'extractor': crawler.extractor,
+            'output_format': args.output_format,
+            'assets': args.assets,
+        },
+        'articles': articles,
+        'wall_seconds': round(wall, 3),
+        'articles_per_second': round(articles / wall, 3) if wall else 0,
+        'cpu_seconds': round(cpu, 3),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'stages': {
+            stage: {
+                'count': stat['count'],
+                'p50_ms': round(stat['p50'] * 1000, 2),
+                'p99_ms': round(stat['p99'] * 1000, 2),
+            }
+            for stage, stat in crawler.metrics.stage_stats().items()
+        },
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='WeixinCrawler 离线基准测试')
+    parser.add_argument('--accounts', type=int, default=2, help='公众号数量')
+    parser.add_argument('--articles-per-account', type=int, default=100, help='模拟服务中每个公众号的文章总数')
+    parser.add_argument('--max-articles', type=int, default=20, help='每个公众号爬取的文章数')
+    parser.add_argument('--latency', type=float, default=50, help='模拟服务平均延迟(毫秒)')
+    parser.add_argument('--jitter', type=float, default=10, help='模拟服务延迟抖动(毫秒)')
+    parser.add_argument('--error-rate', type=float, default=0, help='模拟服务返回 HTTP 500 的概率')
+    parser.add_argument('--server-rate-limit', type=float, default=None, help='模拟服务每秒允许的请求数')
+    parser.add_argument('--login-rate-limit', type=float, default=None, help='模拟服务每个登录账号每秒允许的接口请求数')
+    parser.add_argument('--rate', type=float, default=20, help='爬虫全局每秒请求数')
+    parser.add_argument('--credentials', type=int, default=1, help='登录账号数量')
+    parser.add_argument('--credential-rate', type=float, default=None, help='每个登录账号每秒的接口请求数')
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--account-workers', type=int, default=1)
+    parser.add_argument('--convert-workers', type=int, default=0)
+    parser.add_argument('--extractor', default='auto')
+    parser.add_argument('--output-format', default='csv')
+    parser.add_argument('--assets', action='store_true', help='下载文章中的图片')
+    parser.add_argument('--label', default='', help='本次结果的标签')
+    parser.add_argument('--output', default=str(BENCH_DIR / 'results.jsonl'), help='结果文件')
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+本地模拟的 mp.weixin.qq.com，用于离线基准测试
+
+回放 fixtures/articles 下录制的文章页面，并按公众号生成 searchbiz 和 appmsgpublish 响应
+文章中 mmbiz.qpic.cn 的图片改为指向本服务的 /mmbiz/ 路径，返回由路径决定的固定内容
+支持配置延迟、抖动、错误率、全局限流和按登录账号的接口限流
+
+    python bench/mock_server.py --port 8800 --latency 50 --jitter 20 --error-rate 0.01 --rate-limit 50 --login-rate-limit 5
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+TOKEN = '1234567890'
+# 触发频率限制时公众号平台返回的错误码
+FREQ_CONTROL_RET = 200013
+
+
+class MockWeixinServer:
+    """模拟公众号平台的 HTTP 服务"""
+
+    def __init__(self, port: int = 0, articles_per_account: int = 100, latency: float = 0, jitter: float = 0,
+                 error_rate: float = 0, rate_limit: Optional[float] = None, fixtures_dir: Path = FIXTURES_DIR,
+                 seed: int = 0, login_rate_limit: Optional[float] = None):
+        """
+        :param port: 监听端口，0 表示随机端口
+        :param articles_per_account: 每个公众号的文章总数
+        :param latency: 每个请求的平均延迟(毫秒)
+        :param jitter: 延迟的随机抖动(毫秒)
+        :param error_rate: 返回 HTTP 500 的概率
+        :param rate_limit: 每秒允许的请求数，超出时接口返回频率限制，文章返回 429
+        :param fixtures_dir: 录制的响应所在目录
+        :param seed: 随机数种子
+        :param login_rate_limit: 每个登录账号(token)调用接口的每秒请求数，超出时返回频率限制
+        """
+        self.articles_per_account = articles_per_account
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.login_rate_limit = login_rate_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.allowance: Dict[str, float] = {}
+        self.last_check: Dict[str, float] = {}
+        self.requests = 0
+        # 登录cookie(slave_sid) -> token，没有cookie时使用默认token
+        self.tokens: Dict[str, str] = {}
+        self.articles = [p.read_text(encoding='utf-8') for p in sorted((fixtures_dir / 'articles').glob('*.html'))]
+        if not self.articles:
+            raise ValueError(f"{fixtures_dir / 'articles'} 下没有文章页面")
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _allow(self) -> bool:
+        """全局令牌桶限流"""
+        with self.lock:
+            self.requests += 1
+            return self._take('', self.rate_limit)
+
+    def _allow_login(self, token: str) -> bool:
+        """按登录账号的令牌桶限流"""
+        with self.lock:
+            return self._take(token, self.login_rate_limit)
+
+    def _take(self, key: str, rate: Optional[float]) -> bool:
+        if not rate:
+            return True
+        now = time.monotonic()
+        allowance = min(rate, self.allowance.get(key, rate) + (now - self.last_check.get(key, now)) * rate)
+        self.last_check[key] = now
+        self.allowance[key] = allowance
+        if allowance < 1:
+            return False
+        self.allowance[key] = allowance - 1
+        return True
+
+    def token_for(self, sid: Optional[str]) -> str:
+        """每个登录cookie分配一个独立的token"""
+        if not sid:
+            return TOKEN
+        with self.lock:
+            return self.tokens.setdefault(sid, str(int(TOKEN) + len(self.tokens) + 1))
+
+    def valid_token(self, token: Optional[str]) -> bool:
+        with self.lock:
+            return token == TOKEN or token in self.tokens.values()
+
+    def _delay(self):
+        with self.lock:
+            delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+            failed = self.random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        return failed
+
+    @staticmethod
+    def fakeid(name: str) -> str:
+        return base64.urlsafe_b64encode(name.encode('utf-8')).decode('ascii')
+
+    def search(self, query: str) -> dict:
+        return {
+            'base_resp': {'ret': 0, 'err_msg': 'ok'},
+            'list': [
+                {'fakeid': self.fakeid(query), 'nickname': query, 'alias': '', 'verified': True,
+                 'signature': f'{query} 的简介', 'service_type': 1},
+                {'fakeid': self.fakeid(query + '助手'), 'nickname': query + '助手', 'alias': '', 'verified': False,
+                 'signature': '', 'service_type': 1},
+            ],
+            'total': 2,
+        }
+
+    def publish_page(self, fakeid: str, begin: int, count: int) -> dict:
+        """按发布时间从新到旧生成文章列表，每条发布记录包含一篇文章"""
+        total = self.articles_per_account
+        now = int(time.time())
+        publish_list = []
+        for index in range(begin, min(begin + count, total)):
+            create_time = now - index * 86400
+            link = f'{self.base_url}/s?__biz={fakeid}&mid={total - index}&idx=1&sn={index:08x}#rd'
+            appmsgex = [{
+                'aid': f'{total - index}_1',
+                'title': f'{base64.urlsafe_b64decode(fakeid).decode("utf-8")} 第 {total - index} 篇文章',
+                'link': link,
+                'digest': '文章摘要',
+                'cover': f'https://mmbiz.qpic.cn/mmbiz_jpg/cover{index % 5}/0?wx_fmt=jpeg',
+                'author_name': '作者',
+                'create_time': create_time,
+                'update_time': create_time,
+                'itemidx': 1,
+            }]
+            publish_list.append({
+                'publish_type': 101,
+                'publish_info': json.dumps({'type': 9, 'appmsgex': appmsgex}, ensure_ascii=False),
+            })
+        return {
+            'base_resp': {'ret': 0, 'err_msg': 'ok'},
+            'publish_page': json.dumps({'total_count': total, 'publish_count': total,
+                                        'publish_list': publish_list}, ensure_ascii=False),
+        }
+
+    def article(self, mid: int, title: str) -> str:
+        html = self.articles[mid % len(self.articles)].replace('{title}', title)
+        return html.replace('https://mmbiz.qpic.cn/', f'{self.base_url}/mmbiz/')
+
+    @staticmethod
+    def image(path: str) -> bytes:
+        return b'\x89PNG\r\n\x1a\n' + hashlib.sha256(path.encode('utf-8')).digest() * 64
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, data: dict):
+                self._send(200, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+            def do_GET(self):
+                parts = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                failed = server._delay()
+                if parts.path == '/':
+                    cookie = SimpleCookie(self.headers.get('Cookie', ''))
+                    sid = cookie['slave_sid'].value if 'slave_sid' in cookie else None
+                    token = server.token_for(sid)
+                    self._send(302, b'', 'text/html', {'Location': f'/cgi-bin/home?t=home/index&token={token}'})
+                    return
+                if parts.path == '/cgi-bin/home':
+                    self._send(200, b'<html>home</html>', 'text/html; charset=utf-8')
+                    return
+                if failed:
+                    self._send(500, b'internal error', 'text/plain')
+                    return
+                allowed = server._allow()
+                if parts.path.startswith('/cgi-bin/'):
+                    if not allowed or not server._allow_login(query.get('token', '')):
+                        self._json({'base_resp': {'ret': FREQ_CONTROL_RET, 'err_msg': 'freq control'}})
+                    elif not server.valid_token(query.get('token')):
+                        self._json({'base_resp': {'ret': 200003, 'err_msg': 'invalid session'}})
+                    elif parts.path == '/cgi-bin/searchbiz':
+                        self._json(server.search(query.get('query', '')))
+                    elif parts.path == '/cgi-bin/appmsgpublish':
+                        self._json(server.publish_page(query.get('fakeid', ''), int(query.get('begin', 0)),
+                                                       int(query.get('count', 5))))
+                    else:
+                        self._send(404, b'not found', 'text/plain')
+                elif parts.path.startswith('/mmbiz/'):
+                    if not allowed:
+                        self._send(429, b'', 'text/plain')
+                        return
+                    self._send(200, server.image(parts.path), 'image/png')
+                elif parts.path == '/s':
+                    if not allowed:
+                        self._send(429, '访问过于频繁'.encode('utf-8'), 'text/html; charset=utf-8')
+                        return
+                    name = base64.urlsafe_b64decode(query.get('__biz', '')).decode('utf-8', 'replace')
+                    mid = int(query.get('mid', 0))
+                    body = server.article(mid, f'{name} 第 {mid} 篇文章').encode('utf-8')
+                    self._send(200, body, 'text/html; charset=utf-8')
+                else:
+                    self._send(404, b'not found', 'text/plain')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='本地模拟的 mp.weixin.qq.com')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--articles', type=int, default=100, help='每个公众号的文章总数')
+    parser.add_argument('--latency', type=float, default=0, help='平均延迟(毫秒)')
+    parser.add_argument('--jitter', type=float, default=0, help='延迟抖动(毫秒)')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回 HTTP 500 的概率')
+    parser.add_argument('--rate-limit', type=float, default=None, help='每秒允许的请求数')
+    parser.add_argument('--login-rate-limit', type=float, default=None, help='每个登录账号每秒允许的接口请求数')
+    args = parser.parse_args(argv)
+    server = MockWeixinServer(args.port, args.articles, args.latency, args.jitter, args.error_rate, args.rate_limit,
+                              login_rate_limit=args.login_rate_limit)
+    print(server.base_url, flush=True)
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
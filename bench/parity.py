@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+正文提取后端一致性测试：用各个后端把 fixtures 下的文章页面转换为 markdown，结果需要与 bs4 完全相同
+同时统计每个后端的 CPU 时间，有差异时以非零状态退出
+
+    python bench/parity.py
+    python bench/parity.py --repeat 20 fixtures/articles/sample.html
+"""
+import argparse
+import difflib
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from weixin import EXTRACTORS, LXML_AVAILABLE, convert_article  # noqa: E402
+
+FIXTURE_DIRS = [BENCH_DIR / 'fixtures' / 'parity', BENCH_DIR / 'fixtures' / 'articles']
+REFERENCE = 'bs4'
+
+
+def available_extractors() -> List[str]:
+    return [name for name in EXTRACTORS if name != 'lxml' or LXML_AVAILABLE]
+
+
+def convert(html: str, extractor: str) -> Optional[str]:
+    """转换为 markdown，找不到正文时为 None，出错时返回错误信息"""
+    try:
+        return convert_article(html, extractor)[0]
+    except Exception as e:
+        return f'<{type(e).__name__}: {e}>'
+
+
+def check_page(path: Path, extractors: List[str]) -> List[str]:
+    """
+    比较各个后端的转换结果
+    :return: 与参考后端不同的后端及差异
+    """
+    html = path.read_text(encoding='utf-8')
+    expected = convert(html, REFERENCE)
+    problems = []
+    for extractor in extractors:
+        actual = convert(html, extractor)
+        if actual == expected:
+            continue
+        diff = difflib.unified_diff(str(expected).splitlines(), str(actual).splitlines(),
+                                    REFERENCE, extractor, lineterm='', n=1)
+        problems.append(f'{extractor}:\n' + '\n'.join(diff))
+    return problems
+
+
+def cpu_times(pages: List[str], extractors: List[str], repeat: int) -> Dict[str, float]:
+    """每个后端提取一页正文(不含 markdown 转换)的平均 CPU 时间(毫秒)"""
+    times = {}
+    for extractor in extractors:
+        extract = EXTRACTORS[extractor]
+        start = time.process_time()
+        for _ in range(repeat):
+            for html in pages:
+                try:
+                    extract(html)
+                except Exception:
+                    pass
+        times[extractor] = (time.process_time() - start) / (repeat * len(pages)) * 1000
+    return times
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='正文提取后端一致性测试')
+    parser.add_argument('pages', nargs='*', help='文章页面，默认为 fixtures/parity 和 fixtures/articles 下的所有页面')
+    parser.add_argument('--repeat', type=int, default=5, help='统计 CPU 时间时每页提取的次数，为 0 时不统计')
+    args = parser.parse_args(argv)
+
+    paths = [Path(p) for p in args.pages] or sorted(p for d in FIXTURE_DIRS for p in d.glob('*.html'))
+    extractors = available_extractors()
+    if 'lxml' not in extractors:
+        print('未安装 lxml，跳过 lxml 后端')
+
+    failed = 0
+    for path in paths:
+        problems = check_page(path, extractors)
+        print(f"{'OK  ' if not problems else 'FAIL'} {path.name}")
+        for problem in problems:
+            print('  ' + problem.replace('\n', '\n  '))
+        failed += bool(problems)
+
+    if args.repeat:
+        times = cpu_times([p.read_text(encoding='utf-8') for p in paths], extractors, args.repeat)
+        print('每页提取正文的平均 CPU 时间: ' + ', '.join(f'{name} {ms:.2f} ms' for name, ms in times.items()))
+
+    print(f'{len(paths) - failed}/{len(paths)} 个页面各后端结果一致')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,15 +1,33 @@
 # -*- coding: utf-8 -*-
+import argparse
 import json
 import time
 import random
 import csv
 import logging
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Callable
 import re
 import os
+from html import unescape
+import signal
+import socket
+import sys
+import threading
+import sqlite3
+import hashlib
+import cProfile
+import pstats
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlparse, urlunparse, urlencode, parse_qsl
 
 import requests
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -17,7 +35,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.common.exceptions import TimeoutException, WebDriverException
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import html2text
 from dotenv import load_dotenv
 
@@ -31,13 +49,2163 @@ logger = logging.getLogger(__name__)
 # 加载 .env 文件
 load_dotenv()
 
+try:
+    import lxml.etree
+    import lxml.html
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    import brotli  # noqa: F401  安装后 urllib3 会自动解码 br 响应
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """带默认超时的连接池适配器"""
+
+    def __init__(self, *args, timeout: float = 20, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+# 流水线各阶段之间的结束标记
+_DONE = object()
+
+# base_resp.ret 中表示登录状态失效的错误码
+AUTH_FAILED_RETS = {200003, 200040}
+# base_resp.ret 中表示触发频率限制的错误码
+FREQ_CONTROL_RETS = {200013}
+
+# 文章下载或解析连续失败达到该次数后放弃，不再阻塞翻页位置
+MAX_ARTICLE_FAILURES = 3
+
+# 请求结果分类
+OUTCOME_OK = 'ok'
+OUTCOME_THROTTLED = 'throttled'
+OUTCOME_TRANSIENT = 'transient'
+OUTCOME_AUTH_EXPIRED = 'auth_expired'
+OUTCOME_FATAL = 'fatal'
+
+
+class TokenBucket:
+    """令牌桶，线程安全"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        :param rate: 每秒补充的令牌数
+        :param capacity: 桶容量，默认等于rate且不小于1
+        """
+        self.rate = rate
+        self.fixed_capacity = capacity
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        获取令牌，不足时阻塞等待
+        :param tokens: 需要的令牌数
+        :return: 实际等待的秒数
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def set_rate(self, rate: float):
+        """调整补充速率，已有的令牌保留"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.rate = rate
+            self.capacity = self.fixed_capacity or max(1.0, rate)
+            self.tokens = min(self.tokens, self.capacity)
+
+
+class RateLimiter:
+    """全局 + 按主机的请求速率限制"""
+
+    def __init__(self, rate: float, host_rate: float = None):
+        """
+        :param rate: 全局每秒请求数
+        :param host_rate: 单个主机每秒请求数，不指定则只做全局限制
+        """
+        self.global_bucket = TokenBucket(rate)
+        self.host_rate = host_rate
+        self.host_buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url: str) -> float:
+        """
+        请求前调用，等待直到全局和对应主机都有可用配额
+        :param url: 请求地址
+        :return: 等待的秒数
+        """
+        waited = 0.0
+        if self.host_rate:
+            host = urlparse(url).netloc
+            with self.lock:
+                bucket = self.host_buckets.get(host)
+                if bucket is None:
+                    bucket = self.host_buckets[host] = TokenBucket(self.host_rate)
+            waited += bucket.acquire()
+        waited += self.global_bucket.acquire()
+        return waited
+
+
+class ThrottleController:
+    """
+    根据请求结果自适应调整请求速率：成功时线性增加，被限流时减半(AIMD)
+    同时提供带抖动的指数退避和按接口的熔断
+    HTTP 5xx 和网络错误只重试，不视为限流，不调整速率
+    """
+
+    def __init__(self, bucket: TokenBucket, min_rate: float, max_rate: float, increase: Optional[float] = None,
+                 decrease: float = 0.5, breaker_threshold: int = 5, breaker_cooldown: float = 60,
+                 backoff_base: float = 1, backoff_max: float = 60):
+        """
+        :param bucket: 被调整速率的令牌桶
+        :param min_rate: 最低每秒请求数
+        :param max_rate: 最高每秒请求数
+        :param increase: 每次成功增加的每秒请求数，默认为最高速率的 1%，至少 0.05
+        :param decrease: 被限流时速率乘以的系数
+        :param breaker_threshold: 连续被限流多少次后熔断该接口
+        :param breaker_cooldown: 熔断持续时间(秒)
+        :param backoff_base: 第一次重试前的等待时间(秒)
+        :param backoff_max: 重试等待时间上限(秒)
+        """
+        self.bucket = bucket
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase if increase is not None else max(0.05, max_rate / 100)
+        self.decrease = decrease
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lock = threading.Lock()
+        self.last_decrease = 0.0
+        self.failures: Dict[str, int] = {}
+        self.open_until: Dict[str, float] = {}
+        self.probing: Dict[str, bool] = {}
+
+    @staticmethod
+    def classify(status_code: Optional[int], ret: Optional[int] = None) -> str:
+        """
+        根据 HTTP 状态码和 base_resp.ret 判断请求结果
+        :return: ok/throttled/transient/auth_expired/fatal
+        """
+        if status_code == 429 or ret in FREQ_CONTROL_RETS:
+            return OUTCOME_THROTTLED
+        if status_code is None or status_code >= 500:
+            return OUTCOME_TRANSIENT
+        if ret in AUTH_FAILED_RETS:
+            return OUTCOME_AUTH_EXPIRED
+        if ret not in (None, 0) or status_code >= 400:
+            return OUTCOME_FATAL
+        return OUTCOME_OK
+
+    def wait(self, endpoint: str) -> float:
+        """
+        接口熔断期间阻塞等待，熔断结束后只放行一个试探请求
+        :param endpoint: 接口名称
+        :return: 等待的秒数
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                open_until = self.open_until.get(endpoint)
+                now = time.monotonic()
+                if open_until is None:
+                    return waited
+                if now >= open_until and not self.probing.get(endpoint):
+                    self.probing[endpoint] = True
+                    return waited
+                delay = max(open_until - now, 0.5)
+            time.sleep(delay)
+            waited += delay
+
+    def record(self, endpoint: str, outcome: str):
+        """
+        记录请求结果，调整速率和熔断状态
+        :param endpoint: 接口名称
+        :param outcome: classify 的结果
+        """
+        with self.lock:
+            self.probing[endpoint] = False
+            if outcome == OUTCOME_TRANSIENT:
+                # 服务端错误和网络错误与请求速率无关，不调整速率也不计入熔断
+                return
+            if outcome == OUTCOME_THROTTLED:
+                now = time.monotonic()
+                # 同一批并发请求同时被限流时只减速一次
+                if now - self.last_decrease >= 1 / max(self.bucket.rate, 0.01):
+                    self.last_decrease = now
+                    self._set_rate(self.bucket.rate * self.decrease)
+                failures = self.failures.get(endpoint, 0) + 1
+                self.failures[endpoint] = failures
+                if failures >= self.breaker_threshold:
+                    self.open_until[endpoint] = now + self.breaker_cooldown
+                    logger.warning(f"接口 {endpoint} 连续 {failures} 次被限流，暂停 {self.breaker_cooldown:g} 秒")
+            else:
+                self.failures[endpoint] = 0
+                self.open_until.pop(endpoint, None)
+                if outcome == OUTCOME_OK and self.bucket.rate < self.max_rate:
+                    self._set_rate(self.bucket.rate + self.increase)
+
+    def cancel(self, endpoint: str):
+        """请求因其他异常没有结果时只释放试探名额，不改变速率和熔断状态"""
+        with self.lock:
+            self.probing[endpoint] = False
+
+    def _set_rate(self, rate: float):
+        rate = min(self.max_rate, max(self.min_rate, rate))
+        if rate < self.bucket.rate:
+            logger.info(f"请求被限流，速率降低到 {rate:.2f} 次/秒")
+        self.bucket.set_rate(rate)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        第 attempt 次重试前的等待时间，指数增长并加入随机抖动
+        """
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.5)
+
+
+class CrawlStateStore:
+    """
+    基于 SQLite 的爬取状态，记录已爬取的文章和未完成爬取的翻页位置
+    用于增量爬取和中断后续爬
+    """
+
+    def __init__(self, db_file: str):
+        """
+        :param db_file: SQLite 数据库文件路径
+        """
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    fakeid TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    title TEXT,
+                    content_hash TEXT,
+                    crawled_at REAL,
+                    PRIMARY KEY (fakeid, link)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS cursors (
+                    fakeid TEXT PRIMARY KEY,
+                    begin INTEGER NOT NULL,
+                    updated_at REAL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS failures (
+                    fakeid TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    updated_at REAL,
+                    PRIMARY KEY (fakeid, link)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS accounts (
+                    fakeid TEXT PRIMARY KEY,
+                    last_publish_time INTEGER NOT NULL,
+                    updated_at REAL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS schedules (
+                    account TEXT PRIMARY KEY,
+                    rate REAL,
+                    last_poll REAL,
+                    next_poll REAL NOT NULL
+                )
+            """)
+
+    def has_article(self, fakeid: str, link: str) -> bool:
+        """文章是否已经爬取过"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM articles WHERE fakeid = ? AND link = ?", (fakeid, link)
+            ).fetchone()
+        return row is not None
+
+    def save_article(self, fakeid: str, article: Dict, begin: int):
+        """
+        记录已保存的文章，同时把翻页位置推进到该文章所在的页
+        :param fakeid: 公众号的fakeid
+        :param article: 文章数据，包含 title、link、content
+        :param begin: 文章所在页的开始位置
+        """
+        content_hash = hashlib.sha256(article.get('content', '').encode('utf-8')).hexdigest()
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO articles (fakeid, link, title, content_hash, crawled_at) VALUES (?, ?, ?, ?, ?)",
+                (fakeid, article['link'], article.get('title', ''), content_hash, now)
+            )
+            self.conn.execute("DELETE FROM failures WHERE fakeid = ? AND link = ?", (fakeid, article['link']))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cursors (fakeid, begin, updated_at) VALUES (?, ?, ?)",
+                (fakeid, begin, now)
+            )
+            if article.get('create_time'):
+                self.conn.execute(
+                    "INSERT INTO accounts (fakeid, last_publish_time, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(fakeid) DO UPDATE SET "
+                    "last_publish_time = MAX(last_publish_time, excluded.last_publish_time), updated_at = excluded.updated_at",
+                    (fakeid, article['create_time'], now)
+                )
+
+    def record_failure(self, fakeid: str, link: str) -> int:
+        """
+        记录文章下载或解析失败
+        :return: 该文章累计失败的次数
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO failures (fakeid, link, attempts, updated_at) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(fakeid, link) DO UPDATE SET attempts = attempts + 1, updated_at = excluded.updated_at",
+                (fakeid, link, time.time())
+            )
+            row = self.conn.execute(
+                "SELECT attempts FROM failures WHERE fakeid = ? AND link = ?", (fakeid, link)
+            ).fetchone()
+        return row[0]
+
+    def skip_article(self, fakeid: str, article: Dict):
+        """多次失败后放弃文章：记录为已爬取但没有内容哈希，不再重试，也不推进翻页位置"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO articles (fakeid, link, title, content_hash, crawled_at) VALUES (?, ?, ?, NULL, ?)",
+                (fakeid, article['link'], article.get('title', ''), time.time())
+            )
+            self.conn.execute("DELETE FROM failures WHERE fakeid = ? AND link = ?", (fakeid, article['link']))
+
+    def get_last_publish_time(self, fakeid: str) -> Optional[int]:
+        """
+        已保存文章中最新的发布时间，用于只爬取上次运行之后发布的文章
+        :return: 时间戳，没有记录时返回 None
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT last_publish_time FROM accounts WHERE fakeid = ?", (fakeid,)).fetchone()
+        return row[0] if row else None
+
+    def get_schedules(self) -> Dict[str, Dict]:
+        """读取保存的轮询计划"""
+        with self.lock:
+            rows = self.conn.execute("SELECT account, rate, last_poll, next_poll FROM schedules").fetchall()
+        return {account: {'rate': rate, 'last_poll': last_poll, 'next_poll': next_poll}
+                for account, rate, last_poll, next_poll in rows}
+
+    def save_schedule(self, account: str, rate: Optional[float], last_poll: Optional[float], next_poll: float):
+        """保存公众号的发文频率和下次轮询时间"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO schedules (account, rate, last_poll, next_poll) VALUES (?, ?, ?, ?)",
+                (account, rate, last_poll, next_poll)
+            )
+
+    def get_cursor(self, fakeid: str) -> Optional[int]:
+        """
+        获取未完成爬取的翻页位置
+        :return: 开始位置，没有未完成的爬取时返回 None
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT begin FROM cursors WHERE fakeid = ?", (fakeid,)).fetchone()
+        return row[0] if row else None
+
+    def save_cursor(self, fakeid: str, begin: int):
+        """把翻页位置设为指定的页，下次运行从这里继续"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cursors (fakeid, begin, updated_at) VALUES (?, ?, ?)",
+                (fakeid, begin, time.time())
+            )
+
+    def clear_cursor(self, fakeid: str):
+        """爬取正常结束后清除翻页位置"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM cursors WHERE fakeid = ?", (fakeid,))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class PollScheduler:
+    """
+    按公众号的发文频率安排轮询：发文越频繁轮询间隔越短
+    多个公众号同时到期时，优先轮询预计新文章最多的
+    """
+
+    def __init__(self, accounts: List[str], min_interval: float = 600, max_interval: float = 86400,
+                 poll_factor: float = 0.5, smoothing: float = 0.3, store: Optional[CrawlStateStore] = None):
+        """
+        :param accounts: 公众号列表
+        :param min_interval: 最短轮询间隔(秒)
+        :param max_interval: 最长轮询间隔(秒)
+        :param poll_factor: 期望每次轮询发现的新文章数，轮询间隔为 poll_factor / 发文频率
+        :param smoothing: 发文频率的指数平滑系数，越大越偏向最近一次观测
+        :param store: 保存轮询计划的爬取状态，重启后沿用学到的频率
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.poll_factor = poll_factor
+        self.smoothing = smoothing
+        self.store = store
+        self.lock = threading.Lock()
+        self.running = set()
+        # 公众号 -> {'rate': 每秒发文数，未知时为 None, 'last_poll': 上次轮询时间, 'next_poll': 下次轮询时间}
+        self.schedules: Dict[str, Dict] = {}
+        saved = store.get_schedules() if store else {}
+        for account in accounts:
+            self.schedules[account] = saved.get(account) or {'rate': None, 'last_poll': None, 'next_poll': 0.0}
+
+    def expected(self, account: str, now: float) -> float:
+        """距上次轮询预计新发布的文章数，从未轮询过的公众号视为无穷大"""
+        schedule = self.schedules[account]
+        if schedule['rate'] is None or schedule['last_poll'] is None:
+            return float('inf')
+        return schedule['rate'] * (now - schedule['last_poll'])
+
+    def due(self, now: float = None) -> List[str]:
+        """
+        已到轮询时间且不在轮询中的公众号
+        :return: 按预计新文章数从多到少排列的公众号
+        """
+        now = now or time.time()
+        with self.lock:
+            accounts = [account for account, schedule in self.schedules.items()
+                        if schedule['next_poll'] <= now and account not in self.running]
+            return sorted(accounts, key=lambda account: self.expected(account, now), reverse=True)
+
+    def next_due(self) -> Optional[float]:
+        """不在轮询中的公众号最早的下次轮询时间"""
+        with self.lock:
+            times = [schedule['next_poll'] for account, schedule in self.schedules.items()
+                     if account not in self.running]
+        return min(times) if times else None
+
+    def start(self, account: str):
+        with self.lock:
+            self.running.add(account)
+
+    def record(self, account: str, publish_times: List[int], success: bool = True, now: float = None):
+        """
+        轮询结束后根据列表中文章的发布时间更新发文频率和下次轮询时间
+        :param account: 公众号
+        :param publish_times: 本次获取的列表中文章的发布时间
+        :param success: 本次轮询是否成功，失败时按最短间隔重试
+        """
+        now = now or time.time()
+        with self.lock:
+            self.running.discard(account)
+            schedule = self.schedules[account]
+            if success:
+                times = [t for t in publish_times if t]
+                # 最近几篇文章的平均发文频率，至少按一天计算，长期不发文的公众号频率会逐渐降低
+                observed = len(times) / max(now - min(times), 86400) if times else 0.0
+                if schedule['rate'] is None:
+                    schedule['rate'] = observed
+                else:
+                    schedule['rate'] = self.smoothing * observed + (1 - self.smoothing) * schedule['rate']
+                schedule['last_poll'] = now
+                interval = self.poll_factor / schedule['rate'] if schedule['rate'] > 0 else self.max_interval
+            else:
+                interval = self.min_interval
+            interval = min(self.max_interval, max(self.min_interval, interval))
+            schedule['next_poll'] = now + interval
+            if self.store:
+                self.store.save_schedule(account, schedule['rate'], schedule['last_poll'], schedule['next_poll'])
+        if success:
+            logger.info(f"公众号 {account} 每天约发文 {schedule['rate'] * 86400:.2f} 篇，"
+                        f"{interval / 60:.0f} 分钟后再次检查")
+
+
+class WorkQueue:
+    """
+    多个爬虫进程共享的任务队列：任务以租约方式领取，处理期间定期续约
+    进程崩溃后租约过期，任务重新分配给其他进程；子类实现具体的存储
+    """
+
+    def add(self, items: List[str]):
+        """加入任务，已存在的任务保持原状态"""
+        raise NotImplementedError
+
+    def lease(self, worker: str, ttl: float) -> Optional[str]:
+        """
+        领取一个待处理或租约已过期的任务
+        :param worker: 领取者标识
+        :param ttl: 租约有效期(秒)
+        :return: 任务，没有可领取的任务时返回 None
+        """
+        raise NotImplementedError
+
+    def heartbeat(self, item: str, worker: str, ttl: float) -> bool:
+        """续约，返回租约是否仍属于该领取者"""
+        raise NotImplementedError
+
+    def complete(self, item: str, worker: str) -> bool:
+        """标记任务完成，返回完成时租约是否仍属于该领取者"""
+        raise NotImplementedError
+
+    def fail(self, item: str, worker: str, error: str = ''):
+        """任务失败，未超过最大尝试次数时放回队列"""
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        raise NotImplementedError
+
+    def unfinished(self) -> int:
+        """待处理和处理中的任务数"""
+        counts = self.counts()
+        return counts.get('pending', 0) + counts.get('leased', 0)
+
+    def close(self):
+        pass
+
+
+class SqliteWorkQueue(WorkQueue):
+    """
+    基于 SQLite 的任务队列，领取任务时通过数据库文件锁保证同一任务只被一个进程领取
+    适用于同一主机上的多个进程，或支持文件锁的共享文件系统
+    """
+
+    def __init__(self, db_file: str, max_attempts: int = 3):
+        """
+        :param db_file: SQLite 数据库文件路径
+        :param max_attempts: 每个任务的最大尝试次数，超过后标记为失败
+        """
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        # 自动提交模式，领取任务时手动开启写事务
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                item TEXT PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL
+            )
+        """)
+
+    def add(self, items: List[str]):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO tasks (item, updated_at) VALUES (?, ?)", [(item, now) for item in items]
+                )
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def lease(self, worker: str, ttl: float) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            # BEGIN IMMEDIATE 立即获取写锁，避免两个进程同时领取到同一任务
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "UPDATE tasks SET status = 'failed', error = '租约多次过期', updated_at = ? "
+                    "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                    (now, now, self.max_attempts)
+                )
+                row = self.conn.execute(
+                    "SELECT item FROM tasks WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) "
+                    "ORDER BY attempts, rowid LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row:
+                    self.conn.execute(
+                        "UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                        "updated_at = ? WHERE item = ?",
+                        (worker, now + ttl, now, row[0])
+                    )
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+        return row[0] if row else None
+
+    def heartbeat(self, item: str, worker: str, ttl: float) -> bool:
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE tasks SET lease_until = ?, updated_at = ? WHERE item = ? AND worker = ? AND status = 'leased'",
+                (now + ttl, now, item, worker)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, item: str, worker: str) -> bool:
+        now = time.time()
+        with self.lock:
+            held = self.conn.execute(
+                "SELECT 1 FROM tasks WHERE item = ? AND worker = ? AND status = 'leased'", (item, worker)
+            ).fetchone()
+            # 租约被接管时结果同样有效，直接标记完成，接管者完成时不会重复计数
+            self.conn.execute(
+                "UPDATE tasks SET status = 'done', worker = ?, error = NULL, updated_at = ? WHERE item = ?",
+                (worker, now, item)
+            )
+        return held is not None
+
+    def fail(self, item: str, worker: str, error: str = ''):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "worker = NULL, lease_until = NULL, error = ?, updated_at = ? "
+                "WHERE item = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, error, now, item, worker)
+            )
+
+    def counts(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+WORK_QUEUES = {
+    'sqlite': SqliteWorkQueue,
+}
+
+
+def create_work_queue(backend: str, location: str, **kwargs) -> WorkQueue:
+    """
+    创建任务队列
+    :param backend: 队列后端，目前支持 sqlite
+    :param location: 队列位置，sqlite 为数据库文件路径
+    :return: 任务队列
+    """
+    if backend not in WORK_QUEUES:
+        raise ValueError(f"未知的任务队列后端: {backend}，可选: {', '.join(WORK_QUEUES)}")
+    return WORK_QUEUES[backend](location, **kwargs)
+
+
+class ArticleCache:
+    """
+    文章页面的磁盘缓存，以规范化后的URL的哈希作为键
+    超出容量时按最近访问时间淘汰，支持过期时间和 ETag/Last-Modified 协商
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1024 ** 3, ttl: Optional[float] = None):
+        """
+        :param cache_dir: 缓存目录
+        :param max_bytes: 缓存总大小上限(字节)，默认1GB
+        :param ttl: 缓存有效期(秒)，过期后向服务器协商，默认永不过期
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.cache_dir / 'index.db'), check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    url TEXT,
+                    size INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """
+        规范化文章URL：统一协议和主机名大小写，去掉锚点，查询参数排序
+        """
+        parts = urlparse(url.replace('\\/', '/').strip())
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return urlunparse(('https', parts.netloc.lower(), parts.path, '', query, ''))
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(self.normalize_url(url).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.html'
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        读取缓存
+        :param url: 文章链接
+        :return: 包含 body、etag、last_modified、fresh 的字典，未命中时返回 None
+        """
+        key = self._key(url)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, fetched_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            try:
+                body = self._path(key).read_text(encoding='utf-8')
+            except OSError:
+                with self.conn:
+                    self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        etag, last_modified, fetched_at = row
+        return {
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fresh': self.ttl is None or time.time() - fetched_at < self.ttl,
+        }
+
+    def put(self, url: str, body: str, etag: str = None, last_modified: str = None):
+        """
+        写入缓存，超出容量时淘汰最久未访问的条目
+        :param url: 文章链接
+        :param body: 页面HTML
+        :param etag: 响应的 ETag
+        :param last_modified: 响应的 Last-Modified
+        """
+        key = self._key(url)
+        path = self._path(key)
+        data = body.encode('utf-8')
+        with self.lock:
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+            now = time.time()
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, url, size, etag, last_modified, fetched_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, self.normalize_url(url), len(data), etag, last_modified, now, now)
+                )
+            self._evict()
+
+    def revalidated(self, url: str):
+        """服务器返回 304 时刷新缓存时间"""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE key = ?", (now, now, self._key(url))
+            )
+
+    def _evict(self):
+        """按最近访问时间淘汰，直到总大小不超过上限"""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+        with self.conn:
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._path(key).unlink(missing_ok=True)
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# markdown 中的图片，html2text 输出为 ![alt](url)
+IMAGE_PATTERN = re.compile(r'!\[[^\]]*\]\((https?://[^)\s]+)\)')
+
+# wx_fmt 参数和 Content-Type 对应的扩展名
+IMAGE_EXTENSIONS = {
+    'jpeg': '.jpg', 'jpg': '.jpg', 'png': '.png', 'gif': '.gif', 'webp': '.webp', 'bmp': '.bmp', 'svg': '.svg',
+    'svg+xml': '.svg',
+}
+
+
+def find_image_urls(markdown: str) -> List[str]:
+    """
+    找出 markdown 中的图片地址，去重并保持出现顺序
+    :param markdown: 文章内容
+    :return: 图片地址列表
+    """
+    return list(dict.fromkeys(IMAGE_PATTERN.findall(markdown)))
+
+
+class AssetStore:
+    """
+    内容寻址的图片存储：文件以内容的 sha256 命名，相同内容只保存一份
+    已下载的地址记录在 SQLite 中，跨文章、跨公众号和多次运行共享
+    """
+
+    def __init__(self, asset_dir: str):
+        """
+        :param asset_dir: 图片保存目录
+        """
+        self.asset_dir = Path(asset_dir)
+        self.asset_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.asset_dir / 'index.db'), check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS assets (
+                    url TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """去掉锚点，其余部分(包括 wx_fmt 等查询参数)保持不变"""
+        return urlunparse(urlparse(url.strip())._replace(fragment=''))
+
+    @staticmethod
+    def _extension(url: str, content_type: str) -> str:
+        fmt = dict(parse_qsl(urlparse(url).query)).get('wx_fmt', '').lower()
+        if fmt in IMAGE_EXTENSIONS:
+            return IMAGE_EXTENSIONS[fmt]
+        subtype = content_type.split(';')[0].strip().lower().rpartition('/')[2]
+        return IMAGE_EXTENSIONS.get(subtype, '')
+
+    def get(self, url: str) -> Optional[Path]:
+        """
+        查找已下载的图片
+        :param url: 图片地址
+        :return: 本地文件路径，未下载或文件已被删除时返回 None
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT path FROM assets WHERE url = ?", (self.normalize_url(url),)
+            ).fetchone()
+        if not row:
+            return None
+        path = self.asset_dir / row[0]
+        return path if path.exists() else None
+
+    def put(self, url: str, body: bytes, content_type: str = '') -> Tuple[Path, bool]:
+        """
+        保存图片，内容已存在时只记录地址
+        :param url: 图片地址
+        :param body: 图片内容
+        :param content_type: 响应的 Content-Type，地址中没有 wx_fmt 时用于确定扩展名
+        :return: (本地文件路径, 是否为新内容)
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        relative = f'{digest[:2]}/{digest}{self._extension(url, content_type)}'
+        path = self.asset_dir / relative
+        with self.lock:
+            created = not path.exists()
+            if created:
+                path.parent.mkdir(exist_ok=True)
+                tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+                tmp_path.write_bytes(body)
+                os.replace(tmp_path, path)
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO assets (url, path, size, fetched_at) VALUES (?, ?, ?, ?)",
+                    (self.normalize_url(url), relative, len(body), time.time())
+                )
+        return path, created
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# class 属性中包含 rich_media_content 的元素
+CONTENT_CLASS_PATTERN = re.compile(r'\bclass\s*=\s*["\']?[^"\'>]*(?<![\w-])rich_media_content(?![\w-])')
+
+
+def has_article_content(html: str) -> bool:
+    """页面中是否有正文元素，已删除的文章和环境异常的验证页面没有"""
+    return CONTENT_CLASS_PATTERN.search(html) is not None
+
+
+def _has_content_class(value) -> bool:
+    """判断 class 属性是否包含 rich_media_content，解析阶段 class 尚未拆分为列表"""
+    if not value:
+        return False
+    if isinstance(value, str):
+        value = value.split()
+    return 'rich_media_content' in value
+
+
+def _promote_lazy_images(element):
+    """图片懒加载，真实地址在 data-src 中，src 只是占位图"""
+    for img in element.find_all('img', attrs={'data-src': True}):
+        img['src'] = img['data-src']
+
+
+def _extract_bs4(html: str) -> Optional[str]:
+    """完整解析页面后查找正文"""
+    soup = BeautifulSoup(html, 'html.parser')
+    article_element = soup.find(class_="rich_media_content")
+    if not article_element:
+        return None
+    # 移除脚本和样式
+    for script in article_element(["script", "style"]):
+        script.decompose()
+    _promote_lazy_images(article_element)
+    return str(article_element)
+
+
+def _extract_strainer(html: str) -> Optional[str]:
+    """只为正文子树构建节点，解析器和输出与 bs4 完全相同"""
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer(class_=_has_content_class))
+    article_element = soup.find(class_=_has_content_class)
+    if not article_element:
+        return None
+    for script in article_element(["script", "style"]):
+        script.decompose()
+    _promote_lazy_images(article_element)
+    return str(article_element)
+
+
+# 页面开头的 XML 声明
+XML_DECLARATION_PATTERN = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+
+def _extract_lxml(html: str) -> Optional[str]:
+    """使用 lxml 的 C 解析器查找正文"""
+    # 页面已按 utf-8 解码，lxml 不接受带编码声明的字符串，去掉开头的 XML 声明
+    html = XML_DECLARATION_PATTERN.sub('', html, count=1)
+    try:
+        doc = lxml.html.fromstring(html)
+    except lxml.etree.ParserError:
+        # 页面没有任何元素
+        return None
+    elements = doc.xpath('//*[contains(concat(" ", normalize-space(@class), " "), " rich_media_content ")]')
+    if not elements:
+        return None
+    article_element = elements[0]
+    for script in article_element.xpath('.//script|.//style'):
+        script.drop_tree()
+    # 图片懒加载，真实地址在 data-src 中
+    for img in article_element.xpath('.//img[@data-src]'):
+        img.set('src', img.get('data-src'))
+    return lxml.html.tostring(article_element, encoding='unicode', with_tail=False)
+
+
+# 正文提取后端：输入页面HTML，返回去除脚本样式后的正文HTML，找不到正文时返回 None
+EXTRACTORS = {
+    'bs4': _extract_bs4,
+    'strainer': _extract_strainer,
+    'lxml': _extract_lxml,
+}
+
+
+def resolve_extractor(name: str = 'auto') -> str:
+    """
+    确定使用的正文提取后端
+    :param name: 后端名称，auto 表示安装了 lxml 时使用 lxml，否则使用 strainer
+    :return: 后端名称
+    """
+    if name == 'auto':
+        return 'lxml' if LXML_AVAILABLE else 'strainer'
+    if name not in EXTRACTORS:
+        raise ValueError(f"未知的正文提取后端: {name}，可选: {', '.join(EXTRACTORS)}")
+    if name == 'lxml' and not LXML_AVAILABLE:
+        raise ValueError("使用 lxml 提取正文需要先安装 lxml")
+    return name
+
+
+def html_to_markdown(content_html: str) -> str:
+    """
+    使用 html2text 把正文HTML转换为 markdown 格式文本
+    :param content_html: 正文HTML
+    :return: markdown 文本
+    """
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    h.ignore_images = False
+    return h.handle(content_html).strip()
+
+
+def convert_article(html: str, extractor: str) -> Tuple[Optional[str], float, float]:
+    """
+    从文章页面中提取正文并转换为 markdown，可在子进程中执行
+    :param html: 页面HTML
+    :param extractor: 正文提取后端名称
+    :return: (markdown 文本, 提取耗时, 转换耗时)，找不到正文时文本为 None
+    """
+    start = time.perf_counter()
+    content_html = EXTRACTORS[extractor](html)
+    parsed = time.perf_counter()
+    if content_html is None:
+        return None, parsed - start, 0.0
+    content = html_to_markdown(content_html)
+    return content, parsed - start, time.perf_counter() - parsed
+
+
+def convert_content(content_html: str) -> Tuple[str, None, float]:
+    """
+    把已经提取出的正文转换为 markdown，可在子进程中执行
+    :param content_html: 正文HTML
+    :return: 与 convert_article 相同，提取耗时为 None
+    """
+    start = time.perf_counter()
+    return html_to_markdown(content_html), None, time.perf_counter() - start
+
+
+def content_text(content_html: str) -> str:
+    """去掉标签和空白后的正文纯文本，用于计算指纹"""
+    return re.sub(r'\s+', '', unescape(re.sub(r'<[^>]+>', ' ', content_html)))
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """
+    计算文本的 64 位 simhash，以相邻 shingle 个字符为特征，内容相近的文本指纹只有少数位不同
+    :param text: 纯文本
+    :param shingle: 特征的字符数
+    :return: 指纹
+    """
+    features = {text[i:i + shingle] for i in range(max(len(text) - shingle + 1, 1))}
+    bits = [format(int.from_bytes(hashlib.blake2b(f.encode('utf-8'), digest_size=8).digest(), 'big'), '064b')
+            for f in features]
+    # 按位统计为 1 的特征数，超过一半的位记为 1
+    half = len(bits) / 2
+    return int(''.join('1' if column.count('1') > half else '0' for column in zip(*bits)), 2)
+
+
+class DedupIndex:
+    """
+    基于 simhash 的相似文章索引，保存在 SQLite 中，跨公众号和多次运行共享
+    指纹分为 4 段，海明距离不超过 3 的两个指纹至少有一段完全相同，按段查找候选再比较距离
+    """
+
+    BANDS = 4
+
+    def __init__(self, db_file: str, max_distance: int = 3, min_length: int = 200):
+        """
+        :param db_file: SQLite 数据库文件路径
+        :param max_distance: 视为重复的最大海明距离，不能超过段数减一
+        :param min_length: 正文字数少于该值时不判断重复，避免只有图片的文章互相匹配
+        """
+        if not 0 <= max_distance < self.BANDS:
+            raise ValueError(f"max_distance 需要在 0 到 {self.BANDS - 1} 之间")
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    link TEXT PRIMARY KEY,
+                    fingerprint INTEGER NOT NULL,
+                    account TEXT,
+                    title TEXT,
+                    band0 INTEGER NOT NULL,
+                    band1 INTEGER NOT NULL,
+                    band2 INTEGER NOT NULL,
+                    band3 INTEGER NOT NULL,
+                    created_at REAL
+                )
+            """)
+            for band in range(self.BANDS):
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_band{band} ON fingerprints (band{band})")
+
+    @classmethod
+    def _bands(cls, fingerprint: int) -> List[int]:
+        width = 64 // cls.BANDS
+        return [(fingerprint >> (band * width)) & ((1 << width) - 1) for band in range(cls.BANDS)]
+
+    @staticmethod
+    def _to_signed(fingerprint: int) -> int:
+        """SQLite 的整数是有符号 64 位"""
+        return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+    def find(self, fingerprint: int, link: str) -> Optional[Dict]:
+        """
+        查找内容相近的其他文章
+        :param fingerprint: 文章的 simhash
+        :param link: 文章链接，同一篇文章不算重复
+        :return: 最相近的文章，包含 link、account、title，没有时返回 None
+        """
+        bands = self._bands(fingerprint)
+        where = ' OR '.join(f'band{band} = ?' for band in range(self.BANDS))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT link, fingerprint, account, title FROM fingerprints WHERE ({where}) AND link != ?",
+                (*bands, link)
+            ).fetchall()
+        best = None
+        for other_link, other, account, title in rows:
+            distance = bin((other & ((1 << 64) - 1)) ^ fingerprint).count('1')
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, {'link': other_link, 'account': account, 'title': title})
+        return best[1] if best else None
+
+    def add(self, fingerprint: int, link: str, account: str, title: str):
+        """记录文章的指纹"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (link, fingerprint, account, title, band0, band1, band2, band3, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (link, self._to_signed(fingerprint), account, title, *self._bands(fingerprint), time.time())
+            )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class FakeidCache:
+    """公众号名称到fakeid的本地缓存，保存为 JSON 文件"""
+
+    def __init__(self, cache_file: Optional[str] = None):
+        """
+        :param cache_file: 缓存文件路径，为空时只缓存在内存中
+        """
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        """读取缓存文件，文件不存在或损坏时返回空字典"""
+        if not self.cache_file or not self.cache_file.exists():
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"读取fakeid缓存时发生错误: {e}")
+            return {}
+
+    def get(self, name: str) -> Optional[Dict]:
+        """
+        :param name: 公众号名称
+        :return: 包含 fakeid、nickname、verified 的字典，未缓存时返回 None
+        """
+        with self.lock:
+            return self.entries.get(name)
+
+    def set(self, name: str, fakeid: str, nickname: str, verified: bool):
+        """
+        记录解析结果并写入文件
+        写入前合并文件中其他进程记录的结果，同一公众号保留较新的一条
+        """
+        with self.lock:
+            self.entries[name] = {
+                'fakeid': fakeid,
+                'nickname': nickname,
+                'verified': verified,
+                'resolved_at': int(time.time()),
+            }
+            if not self.cache_file:
+                return
+            for key, entry in self._load().items():
+                if entry.get('resolved_at', 0) > self.entries.get(key, {}).get('resolved_at', 0):
+                    self.entries[key] = entry
+            tmp_file = self.cache_file.with_name(f'{self.cache_file.name}.{os.getpid()}.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.cache_file)
+
+
+class SessionManager:
+    """
+    在内存中维护会话的cookies和token
+    token 只在首次使用或接口返回登录失效时获取，cookies 变化后合并一段时间再原子写入文件
+    """
+
+    def __init__(self, session: requests.Session, cookie_file: Path, base_url: str,
+                 request: Callable[..., requests.Response], save_interval: float = 10):
+        """
+        :param session: 该组cookies使用的requests会话
+        :param cookie_file: cookies文件路径
+        :param base_url: 公众号平台地址，用于获取token
+        :param request: 发送请求的函数，获取token时经过限流，通过 manager 参数指定会话
+        :param save_interval: cookies写入文件的最小间隔(秒)，间隔内的变化在间隔结束时写入
+        """
+        self.session = session
+        self.cookie_file = cookie_file
+        self.base_url = base_url
+        self.request = request
+        self.save_interval = save_interval
+        self.token: Optional[str] = None
+        self.token_lock = threading.Lock()
+        self.cookie_lock = threading.Lock()
+        self.loaded = False
+        self.dirty = False
+        self.last_saved = 0.0
+        self.save_timer: Optional[threading.Timer] = None
+
+    def load(self) -> Dict[str, str]:
+        """
+        从本地文件读取cookies并同步到会话
+        :return: cookie字典
+        """
+        with open(self.cookie_file, 'r', encoding='utf-8') as f:
+            cookies = json.load(f)
+        self.session.cookies.update(cookies)
+        self.loaded = True
+        return cookies
+
+    def update(self, cookies: Dict[str, str]):
+        """合并新的cookies，并在下次写入时保存"""
+        self.session.cookies.update(cookies)
+        self.loaded = True
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        """标记cookies有变化，距离上次写入超过间隔时立即写入，否则在间隔结束时写入"""
+        with self.cookie_lock:
+            self.dirty = True
+            remaining = self.last_saved + self.save_interval - time.monotonic()
+            if remaining <= 0:
+                self._write()
+            elif self.save_timer is None:
+                self.save_timer = threading.Timer(remaining, self.flush)
+                self.save_timer.daemon = True
+                self.save_timer.start()
+
+    def flush(self):
+        """立即写入尚未保存的cookies"""
+        with self.cookie_lock:
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+                self.save_timer = None
+            if self.dirty:
+                self._write()
+
+    def _write(self):
+        """
+        先写临时文件再替换，避免写入中断导致cookies文件损坏
+        多个进程共用同一个cookies文件，写入前合并文件中其他进程保存的cookies
+        """
+        cookies = {}
+        try:
+            with open(self.cookie_file, 'r', encoding='utf-8') as f:
+                cookies = json.load(f)
+        except (OSError, ValueError):
+            pass
+        cookies.update(self.session.cookies.get_dict())
+        tmp_file = self.cookie_file.with_name(f'{self.cookie_file.name}.{os.getpid()}.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(cookies, f)
+        os.replace(tmp_file, self.cookie_file)
+        self.dirty = False
+        self.last_saved = time.monotonic()
+        logger.info("已更新本地cookies")
+
+    @staticmethod
+    def parse_token(response: requests.Response) -> Optional[str]:
+        """从主页跳转后的地址中提取token"""
+        token = re.findall(r'token=(\d+)', str(response.url))
+        return token[0] if token else None
+
+    def set_token(self, token: str):
+        with self.token_lock:
+            self.token = token
+
+    def get_token(self) -> Optional[str]:
+        """
+        获取token，只在还没有token时请求主页
+        :return: token，获取失败时返回 None
+        """
+        with self.token_lock:
+            if not self.token:
+                self.token = self._fetch_token()
+            return self.token
+
+    def refresh_token(self, stale_token: Optional[str]) -> Optional[str]:
+        """
+        接口返回登录失效时重新获取token，其他线程已经刷新过时直接返回新的token
+        :param stale_token: 失效的token
+        :return: 新的token
+        """
+        with self.token_lock:
+            if self.token == stale_token:
+                logger.info("token已失效，重新获取")
+                self.token = self._fetch_token()
+            return self.token
+
+    def _fetch_token(self) -> Optional[str]:
+        try:
+            if not self.loaded and self.cookie_file.exists():
+                self.load()
+            token = self.parse_token(self.request(self.base_url, manager=self))
+            if not token:
+                logger.error("获取token失败: cookies可能已失效")
+            return token
+        except Exception as e:
+            logger.error(f"获取token失败: {e}")
+            return None
+
+
+class Credential:
+    """一组登录凭证(cookies + token)，及其健康状态和剩余请求配额"""
+
+    def __init__(self, name: str, manager: SessionManager, bucket: TokenBucket, throttle: ThrottleController):
+        """
+        :param name: 凭证名称，用于日志和指标
+        :param manager: 维护该凭证cookies和token的SessionManager
+        :param bucket: 该凭证的请求配额
+        :param throttle: 按该凭证的请求结果调整配额的控制器
+        """
+        self.name = name
+        self.manager = manager
+        self.bucket = bucket
+        self.throttle = throttle
+        self.inflight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.cooldown_until = 0.0
+        self.expired = False
+        self.logging_in = False
+
+    def budget(self) -> float:
+        """当前可立即使用的请求配额"""
+        with self.bucket.lock:
+            elapsed = time.monotonic() - self.bucket.updated
+            return min(self.bucket.capacity, self.bucket.tokens + elapsed * self.bucket.rate)
+
+
+class CredentialPool:
+    """
+    多个登录凭证组成的池，接口请求优先分配给正在处理请求最少、剩余配额最多的凭证
+    被限流的凭证冷却一段时间，登录失效的凭证在后台重新扫码登录
+    """
+
+    def __init__(self, credentials: List[Credential], login: Callable[[Credential], bool]):
+        """
+        :param credentials: 登录凭证列表
+        :param login: 重新登录某个凭证的函数，返回是否成功
+        """
+        self.credentials = credentials
+        self.login = login
+        self.lock = threading.Condition()
+        # 扫码登录需要人工操作，同一时间只进行一个
+        self.login_lock = threading.Lock()
+
+    def acquire(self) -> Credential:
+        """
+        获取一个可用的凭证，都在冷却或重新登录时阻塞等待
+        :return: 凭证，用完后调用 release
+        """
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                ready = [c for c in self.credentials if not c.expired and c.cooldown_until <= now]
+                if ready:
+                    credential = min(ready, key=lambda c: (c.inflight, -c.budget(), c.requests))
+                    credential.inflight += 1
+                    credential.requests += 1
+                    return credential
+                alive = [c for c in self.credentials if not c.expired or c.logging_in]
+                if not alive:
+                    raise RuntimeError("没有可用的登录凭证")
+                cooling = [c.cooldown_until for c in alive if not c.expired]
+                self.lock.wait(max(min(cooling) - now, 0.1) if cooling else None)
+
+    def release(self, credential: Credential, outcome: str):
+        """
+        归还凭证并根据请求结果更新其状态
+        :param credential: acquire 得到的凭证
+        :param outcome: 请求结果分类
+        """
+        with self.lock:
+            credential.inflight -= 1
+            if outcome == OUTCOME_THROTTLED:
+                delay = credential.throttle.backoff(credential.throttled)
+                credential.throttled += 1
+                credential.cooldown_until = time.monotonic() + delay
+            elif outcome == OUTCOME_AUTH_EXPIRED:
+                self._expire(credential)
+            elif outcome != OUTCOME_TRANSIENT:
+                credential.throttled = 0
+            self.lock.notify_all()
+
+    def expire(self, credential: Credential):
+        """标记凭证已失效并在后台重新登录"""
+        with self.lock:
+            self._expire(credential)
+            self.lock.notify_all()
+
+    def _expire(self, credential: Credential):
+        credential.expired = True
+        if credential.logging_in:
+            return
+        credential.logging_in = True
+        logger.warning(f"登录账号 {credential.name} 已失效，在后台重新登录")
+        threading.Thread(target=self._relogin, args=(credential,), daemon=True).start()
+
+    def _relogin(self, credential: Credential):
+        with self.login_lock:
+            try:
+                success = self.login(credential)
+            except Exception as e:
+                logger.error(f"登录账号 {credential.name} 重新登录时发生错误: {e}")
+                success = False
+        with self.lock:
+            credential.logging_in = False
+            if success:
+                credential.expired = False
+                credential.throttled = 0
+                credential.cooldown_until = 0.0
+                logger.info(f"登录账号 {credential.name} 已重新登录")
+            else:
+                logger.error(f"登录账号 {credential.name} 重新登录失败")
+            self.lock.notify_all()
+
+    def status(self) -> List[Dict]:
+        """各凭证的健康状态和剩余配额"""
+        now = time.monotonic()
+        with self.lock:
+            return [{
+                'name': c.name,
+                'healthy': not c.expired and c.cooldown_until <= now,
+                'expired': c.expired,
+                'inflight': c.inflight,
+                'requests': c.requests,
+                'cooldown': round(max(c.cooldown_until - now, 0), 1),
+                'budget': round(c.budget(), 2),
+                'rate': round(c.bucket.rate, 2),
+            } for c in self.credentials]
+
+    def flush(self):
+        """立即写入所有凭证尚未保存的cookies"""
+        for credential in self.credentials:
+            credential.manager.flush()
+
+
+class ArticleSink:
+    """
+    文章输出的基类：先缓冲，达到条数、字节数或时间阈值时批量写出
+    子类实现 _write_batch 和 _close
+    """
+
+    def __init__(self, path: Path, fields: List[str], flush_rows: int = 20, flush_bytes: int = 8 * 1024 ** 2,
+                 flush_interval: float = 5, on_flush: Callable[[List[Dict]], None] = None):
+        """
+        :param path: 输出文件路径
+        :param fields: 输出的字段
+        :param flush_rows: 缓冲的最大文章数
+        :param flush_bytes: 缓冲的最大内容字节数
+        :param flush_interval: 缓冲的最长时间(秒)
+        :param on_flush: 每批文章写出后的回调，参数为写出的原始文章数据
+        """
+        self.path = path
+        self.fields = fields
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.buffer: List[Dict] = []
+        self.buffer_bytes = 0
+        self.last_flush = time.monotonic()
+
+    def write(self, article: Dict):
+        self.buffer.append(article)
+        self.buffer_bytes += len(article.get('content', '').encode('utf-8'))
+        if (len(self.buffer) >= self.flush_rows or self.buffer_bytes >= self.flush_bytes
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        rows = self.buffer
+        self.buffer = []
+        self.buffer_bytes = 0
+        self._write_batch([self._project(row) for row in rows])
+        if self.on_flush:
+            self.on_flush(rows)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._close()
+
+    def _project(self, article: Dict) -> Dict:
+        """只保留需要输出的字段"""
+        return {field: article.get(field, '') for field in self.fields}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _write_batch(self, rows: List[Dict]):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+
+class CsvSink(ArticleSink):
+    """CSV 输出，追加时不重复写表头，并沿用已有文件的列"""
+
+    def __init__(self, path: Path, fields: List[str], append: bool = False, **kwargs):
+        append = append and path.exists() and path.stat().st_size > 0
+        if append:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                fields = next(csv.reader(f), None) or fields
+        super().__init__(path, fields, **kwargs)
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8', newline='')
+        self.writer = csv.DictWriter(self.file, fields, extrasaction='ignore')
+        if not append:
+            self.writer.writeheader()
+
+    def _write_batch(self, rows: List[Dict]):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def _close(self):
+        self.file.close()
+
+
+class JsonlSink(ArticleSink):
+    """
+    JSON Lines 输出，可选 gzip/zstd 压缩
+    每批数据压缩为独立的 gzip member 或 zstd frame 追加到文件末尾，中断时已写出的批次仍然完整可读
+    """
+
+    def __init__(self, path: Path, fields: List[str], append: bool = False, compression: Optional[str] = None,
+                 **kwargs):
+        super().__init__(path, fields, **kwargs)
+        if compression not in (None, 'gzip', 'zstd'):
+            raise ValueError(f"不支持的压缩方式: {compression}，可选: gzip, zstd")
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError("使用 zstd 压缩需要先安装 zstandard")
+        self.compression = compression
+        self.compressor = zstandard.ZstdCompressor() if compression == 'zstd' else None
+        self.file = open(path, 'ab' if append else 'wb')
+
+    def _write_batch(self, rows: List[Dict]):
+        data = ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode('utf-8')
+        if self.compression == 'gzip':
+            data = gzip.compress(data)
+        elif self.compression == 'zstd':
+            data = self.compressor.compress(data)
+        self.file.write(data)
+        self.file.flush()
+
+    def _close(self):
+        self.file.close()
+
+
+class ParquetSink(ArticleSink):
+    """
+    Parquet 输出，每批数据写为一个 row group
+    Parquet 文件不能追加，每次运行在 {公众号}.parquet 目录下写一个新的分片文件
+    列类型按字段名固定，不从数据推断，避免第一批全为空的列被推断为 null 类型
+    """
+
+    # 整数类型的字段，其他字段为字符串
+    INTEGER_FIELDS = {'create_time', 'update_time', 'idx'}
+
+    def __init__(self, path: Path, fields: List[str], append: bool = False, **kwargs):
+        if pq is None:
+            raise ValueError("输出 Parquet 需要先安装 pyarrow")
+        path.mkdir(parents=True, exist_ok=True)
+        if not append:
+            for part in path.glob('part-*.parquet'):
+                part.unlink()
+        super().__init__(path / f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(4).hex()}.parquet", fields, **kwargs)
+        self.schema = pa.schema([(field, pa.int64() if field in self.INTEGER_FIELDS else pa.string())
+                                 for field in fields])
+        self.writer = None
+
+    def _write_batch(self, rows: List[Dict]):
+        for row in rows:
+            for field in self.INTEGER_FIELDS.intersection(row):
+                row[field] = None if row[field] in ('', None) else int(row[field])
+        table = pa.Table.from_pylist(rows, schema=self.schema)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(str(self.path), self.schema)
+        self.writer.write_table(table)
+
+    def _close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+SINKS = {
+    'csv': (CsvSink, '.csv'),
+    'jsonl': (JsonlSink, '.jsonl'),
+    'parquet': (ParquetSink, '.parquet'),
+}
+
+
+def create_sink(output_format: str, account: str, fields: List[str], append: bool = False,
+                compression: Optional[str] = None, output_dir: str = '.', **kwargs) -> ArticleSink:
+    """
+    创建公众号的文章输出
+    :param output_format: 输出格式 csv/jsonl/parquet
+    :param account: 公众号名称，用作文件名
+    :param fields: 输出的字段
+    :param append: 是否追加到已有输出
+    :param compression: jsonl 的压缩方式 gzip/zstd
+    :param output_dir: 输出目录
+    :return: 文章输出
+    """
+    if output_format not in SINKS:
+        raise ValueError(f"未知的输出格式: {output_format}，可选: {', '.join(SINKS)}")
+    sink_class, suffix = SINKS[output_format]
+    if output_format == 'jsonl':
+        suffix += {'gzip': '.gz', 'zstd': '.zst'}.get(compression, '')
+        kwargs['compression'] = compression
+    return sink_class(Path(output_dir) / f'{account}{suffix}', fields, append=append, **kwargs)
+
+
+# 按字切分的文字：中日韩统一表意文字、假名和韩文音节
+CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+
+
+def cjk_bigrams(text: Optional[str]) -> str:
+    """
+    把连续的中日韩文字切分为相邻两字一组，每段末尾再单独保留最后一个字，其他文字原样保留
+    例如 "人工智能AI" 切分为 "人工 工智 智能 能 AI"，供 unicode61 分词的 FTS5 索引 1-2 个字的关键词
+    """
+    def split(match):
+        run = match.group()
+        return ' ' + ' '.join([run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]) + ' '
+    return CJK_PATTERN.sub(split, text or '')
+
+
+class SearchIndex:
+    """
+    基于 SQLite FTS5 的文章全文索引，标题和正文使用 trigram 分词，中文不需要额外分词
+    trigram 只能查找至少 3 个字的关键词，1-2 个字的关键词查找按两字切分的第二个索引
+    """
+
+    def __init__(self, db_file: str):
+        """
+        :param db_file: SQLite 数据库文件路径
+        """
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        # 两字索引的触发器中调用，每个连接都需要注册
+        self.conn.create_function('cjk_bigrams', 1, cjk_bigrams, deterministic=True)
+        try:
+            backfill = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'docs'"
+            ).fetchone() and not self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'docs_bigram'"
+            ).fetchone()
+            with self.conn:
+                self.conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS docs (
+                        id INTEGER PRIMARY KEY,
+                        link TEXT NOT NULL UNIQUE,
+                        account TEXT,
+                        title TEXT,
+                        create_time INTEGER,
+                        content TEXT
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_docs_account_time ON docs (account, create_time);
+                    CREATE INDEX IF NOT EXISTS idx_docs_time ON docs (create_time);
+                    CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+                        title, content, content='docs', content_rowid='id', tokenize='trigram'
+                    );
+                    CREATE VIRTUAL TABLE IF NOT EXISTS docs_bigram USING fts5(
+                        title, content, content='', tokenize='unicode61'
+                    );
+                    CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+                        INSERT INTO docs_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+                        INSERT INTO docs_fts (docs_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE ON docs BEGIN
+                        INSERT INTO docs_fts (docs_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+                        INSERT INTO docs_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS docs_bigram_ai AFTER INSERT ON docs BEGIN
+                        INSERT INTO docs_bigram (rowid, title, content)
+                        VALUES (new.id, cjk_bigrams(new.title), cjk_bigrams(new.content));
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS docs_bigram_ad AFTER DELETE ON docs BEGIN
+                        INSERT INTO docs_bigram (docs_bigram, rowid, title, content)
+                        VALUES ('delete', old.id, cjk_bigrams(old.title), cjk_bigrams(old.content));
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS docs_bigram_au AFTER UPDATE ON docs BEGIN
+                        INSERT INTO docs_bigram (docs_bigram, rowid, title, content)
+                        VALUES ('delete', old.id, cjk_bigrams(old.title), cjk_bigrams(old.content));
+                        INSERT INTO docs_bigram (rowid, title, content)
+                        VALUES (new.id, cjk_bigrams(new.title), cjk_bigrams(new.content));
+                    END;
+                """)
+                if backfill:
+                    # 旧版本建立的索引没有两字索引，补建已有的文章
+                    logger.info("正在为已有文章建立两字索引")
+                    self.conn.execute(
+                        "INSERT INTO docs_bigram (rowid, title, content) "
+                        "SELECT id, cjk_bigrams(title), cjk_bigrams(content) FROM docs"
+                    )
+        except sqlite3.OperationalError as e:
+            self.conn.close()
+            raise ValueError(f"当前 SQLite 不支持 FTS5 trigram 分词(需要 3.34 及以上): {e}")
+
+    def add(self, account: str, articles: List[Dict]):
+        """
+        加入或更新一批文章，以链接区分
+        :param account: 公众号名称
+        :param articles: 文章数据，包含 title、link、create_time、content
+        """
+        rows = [(article['link'], account, article.get('title', ''), article.get('create_time') or None,
+                 article.get('content', '')) for article in articles]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO docs (link, account, title, create_time, content) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(link) DO UPDATE SET account = excluded.account, title = excluded.title, "
+                "create_time = excluded.create_time, content = excluded.content",
+                rows
+            )
+
+    def search(self, query: str, account: str = None, since: float = None, until: float = None,
+               limit: int = 20) -> List[Dict]:
+        """
+        搜索文章，多个关键词用空格分隔，需要同时出现
+        :param query: 关键词
+        :param account: 只搜索该公众号
+        :param since: 只搜索该时间及之后发布的文章
+        :param until: 只搜索该时间及之前发布的文章
+        :param limit: 最多返回的文章数
+        :return: 文章列表，包含 title、account、link、create_time、snippet、score，有关键词走索引时按相关度排序，
+                 没有关键词时按发布时间从新到旧列出
+        """
+        terms = query.split()
+        long_terms = [term for term in terms if len(term) >= 3]
+        short_match = ' AND '.join(filter(None, (self._bigram_phrase(term) for term in terms if len(term) < 3)))
+        if terms and not long_terms and not short_match:
+            # 关键词只有标点，没有可以匹配的内容
+            return []
+        conditions, params = [], []
+        if long_terms and short_match:
+            conditions.append("d.id IN (SELECT rowid FROM docs_bigram WHERE docs_bigram MATCH ?)")
+            params.append(short_match)
+        if account:
+            conditions.append("d.account = ?")
+            params.append(account)
+        if since is not None:
+            conditions.append("d.create_time >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("d.create_time <= ?")
+            params.append(until)
+        if long_terms:
+            # 每个关键词作为短语，双引号需要转义
+            match = ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in long_terms)
+            sql = ("SELECT d.title, d.account, d.link, d.create_time, d.content, -bm25(docs_fts, 10.0, 1.0) AS score "
+                   "FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid WHERE docs_fts MATCH ?")
+            params.insert(0, match)
+            order = "score DESC"
+        elif short_match:
+            sql = ("SELECT d.title, d.account, d.link, d.create_time, d.content, -bm25(docs_bigram, 10.0, 1.0) AS score "
+                   "FROM docs_bigram JOIN docs d ON d.id = docs_bigram.rowid WHERE docs_bigram MATCH ?")
+            params.insert(0, short_match)
+            order = "score DESC"
+        else:
+            sql = "SELECT d.title, d.account, d.link, d.create_time, d.content, 0.0 AS score FROM docs d WHERE 1"
+            order = "d.create_time DESC"
+        sql += ''.join(f" AND {condition}" for condition in conditions) + f" ORDER BY {order} LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [{
+            'title': title,
+            'account': account,
+            'link': link,
+            'create_time': create_time,
+            'snippet': self._snippet(content or '', terms),
+            'score': score,
+        } for title, account, link, create_time, content, score in rows]
+
+    @staticmethod
+    def _bigram_phrase(term: str) -> Optional[str]:
+        """
+        把 1-2 个字的关键词转换为两字索引的前缀短语查询
+        两个中文字对应一个两字词，单个中文字或英文按前缀匹配以它开头的词
+        :return: FTS5 查询，关键词只有标点时返回 None
+        """
+        tokens = []
+        for part in re.split(f'({CJK_PATTERN.pattern})', term):
+            if CJK_PATTERN.fullmatch(part):
+                tokens += [part[i:i + 2] for i in range(max(len(part) - 1, 1))]
+            else:
+                tokens += re.findall(r'\w+', part)
+        if not tokens:
+            return None
+        return '"{}" *'.format(' '.join(tokens).replace('"', '""'))
+
+    @staticmethod
+    def _snippet(content: str, terms: List[str], width: int = 60) -> str:
+        """截取第一个关键词附近的正文"""
+        positions = [content.find(term) for term in terms if term in content]
+        start = max(min(positions) - width // 2, 0) if positions else 0
+        snippet = re.sub(r'\s+', ' ', content[start:start + width * 2]).strip()
+        return ('…' if start else '') + snippet
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class Metrics:
+    """
+    爬虫各阶段的指标：耗时直方图、计数器和并发数，可导出为 Prometheus 文本格式
+    可选对指定阶段使用 cProfile 采样
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    PREFIX = 'wxcrawler_'
+
+    def __init__(self, profile_stages: List[str] = None, sample_size: int = 10000):
+        """
+        :param profile_stages: 需要 cProfile 采样的阶段
+        :param sample_size: 每个直方图保留用于计算分位数的样本数
+        """
+        self.lock = threading.Lock()
+        self.histograms: Dict[Tuple, Dict] = {}
+        self.counters: Dict[Tuple, float] = {}
+        self.gauges: Dict[Tuple, float] = {}
+        self.sample_size = sample_size
+        self.profile_stages = set(profile_stages or [])
+        self.profiles: Dict[str, pstats.Stats] = {}
+        self.profile_lock = threading.Lock()
+        self.started = time.time()
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> Tuple:
+        return (name,) + tuple(sorted(labels.items()))
+
+    def observe(self, name: str, value: float, **labels):
+        """记录一次直方图观测值"""
+        key = self._key(name, labels)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {
+                    'buckets': [0] * len(self.BUCKETS),
+                    'count': 0,
+                    'sum': 0.0,
+                    'samples': deque(maxlen=self.sample_size),
+                }
+            for i, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    hist['buckets'][i] += 1
+            hist['count'] += 1
+            hist['sum'] += value
+            hist['samples'].append(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """计数器加一"""
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def counter(self, name: str, **labels) -> float:
+        """读取计数器的当前值"""
+        with self.lock:
+            return self.counters.get(self._key(name, labels), 0)
+
+    def gauge_add(self, name: str, delta: float, **labels):
+        """调整当前值，如正在进行的请求数"""
+        key = self._key(name, labels)
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0) + delta
+
+    @contextmanager
+    def timer(self, stage: str):
+        """
+        统计阶段耗时和并发数，阶段抛出异常时记一次错误
+        :param stage: 阶段名称
+        """
+        # Python 3.12 起同一时间只能有一个 cProfile 在运行，其他线程或嵌套的阶段正在采样时跳过本次采样
+        profiling = stage in self.profile_stages and self.profile_lock.acquire(blocking=False)
+        profile = None
+        self.gauge_add('inflight', 1, stage=stage)
+        start = time.perf_counter()
+        try:
+            if profiling:
+                profile = self._start_profile()
+            yield
+        except Exception:
+            self.inc('errors_total', stage=stage)
+            raise
+        finally:
+            if profile:
+                profile.disable()
+                self._add_profile(stage, profile)
+            if profiling:
+                self.profile_lock.release()
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage)
+            self.gauge_add('inflight', -1, stage=stage)
+
+    @staticmethod
+    def _start_profile() -> Optional[cProfile.Profile]:
+        """开始 cProfile 采样，已有其他性能分析工具在运行时返回 None"""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return None
+        return profile
+
+    def _add_profile(self, stage: str, profile: cProfile.Profile):
+        with self.lock:
+            if stage in self.profiles:
+                self.profiles[stage].add(profile)
+            else:
+                self.profiles[stage] = pstats.Stats(profile)
+
+    def dump_profiles(self, profile_dir: str):
+        """把各阶段的 cProfile 结果保存为 {阶段}.prof，可用 pstats 或 snakeviz 查看"""
+        with self.lock:
+            if not self.profiles:
+                return
+            Path(profile_dir).mkdir(parents=True, exist_ok=True)
+            for stage, stats in self.profiles.items():
+                stats.dump_stats(str(Path(profile_dir) / f'{stage}.prof'))
+        logger.info(f"各阶段的性能分析结果已保存到 {profile_dir}")
+
+    @staticmethod
+    def _format_labels(labels: Tuple, extra: str = '') -> str:
+        parts = [f'{k}="{v}"' for k, v in labels]
+        if extra:
+            parts.append(extra)
+        return '{' + ','.join(parts) + '}' if parts else ''
+
+    def render(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        with self.lock:
+            typed = set()
+            for key, value in sorted(self.counters.items()):
+                name = self.PREFIX + key[0]
+                if name not in typed:
+                    lines.append(f'# TYPE {name} counter')
+                    typed.add(name)
+                lines.append(f'{name}{self._format_labels(key[1:])} {value}')
+            for key, value in sorted(self.gauges.items()):
+                name = self.PREFIX + key[0]
+                if name not in typed:
+                    lines.append(f'# TYPE {name} gauge')
+                    typed.add(name)
+                lines.append(f'{name}{self._format_labels(key[1:])} {value}')
+            for key, hist in sorted(self.histograms.items()):
+                name = self.PREFIX + key[0]
+                if name not in typed:
+                    lines.append(f'# TYPE {name} histogram')
+                    typed.add(name)
+                for bound, count in zip(self.BUCKETS, hist['buckets']):
+                    le = 'le="%s"' % bound
+                    lines.append(f'{name}_bucket{self._format_labels(key[1:], le)} {count}')
+                le = 'le="+Inf"'
+                lines.append(f'{name}_bucket{self._format_labels(key[1:], le)} {hist["count"]}')
+                lines.append(f'{name}_sum{self._format_labels(key[1:])} {hist["sum"]}')
+                lines.append(f'{name}_count{self._format_labels(key[1:])} {hist["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, metrics_file: str):
+        """原子写入 Prometheus 文本文件，可配合 node_exporter 的 textfile collector 使用"""
+        tmp_file = f'{metrics_file}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_file, metrics_file)
+
+    def stage_stats(self) -> Dict[str, Dict]:
+        """
+        各阶段的耗时统计
+        :return: {阶段: {count, total, p50, p99}}
+        """
+        stats = {}
+        with self.lock:
+            for key, hist in self.histograms.items():
+                if key[0] != 'stage_seconds':
+                    continue
+                samples = sorted(hist['samples'])
+                stage = dict(key[1:])['stage']
+                stats[stage] = {
+                    'count': hist['count'],
+                    'total': hist['sum'],
+                    'p50': samples[int(len(samples) * 0.5)] if samples else 0,
+                    'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))] if samples else 0,
+                }
+        return stats
+
+    def summary(self) -> str:
+        """运行结束时输出的汇总"""
+        lines = [f"运行耗时 {time.time() - self.started:.1f}s"]
+        for stage, stat in sorted(self.stage_stats().items()):
+            lines.append(f"  {stage:<16} 次数 {stat['count']:<6} 总耗时 {stat['total']:8.2f}s  "
+                         f"p50 {stat['p50'] * 1000:8.1f}ms  p99 {stat['p99'] * 1000:8.1f}ms")
+        with self.lock:
+            for key, value in sorted(self.counters.items()):
+                lines.append(f"  {key[0]}{self._format_labels(key[1:])} {value:g}")
+        return '\n'.join(lines)
+
+    def serve(self, port: int) -> ThreadingHTTPServer:
+        """
+        在后台线程中启动 /metrics HTTP 服务
+        :param port: 监听端口
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"指标服务已启动: http://0.0.0.0:{port}/metrics")
+        return server
+
+
+def parse_time(value) -> Optional[float]:
+    """
+    解析时间参数，支持时间戳和本地时间 YYYY-MM-DD[ HH:MM[:SS]]
+    :param value: 时间字符串或时间戳
+    :return: 时间戳，为空时返回 None
+    """
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return time.mktime(time.strptime(value, fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"无法解析的时间: {value}，格式为时间戳或 YYYY-MM-DD[ HH:MM[:SS]]")
+
+
 class WeixinCrawler:
-    def __init__(self, account_list: List[str], chrome_driver_path: str = None, max_articles: int = 5):
+    def __init__(self, account_list: List[str], chrome_driver_path: str = None, max_articles: int = 5,
+                 pool_size: int = 10, timeout: float = 20, workers: int = 4,
+                 rate: float = 1.0, host_rate: float = None, queue_size: int = 10,
+                 account_workers: int = 1, state_file: Optional[str] = 'crawl_state.db',
+                 cache_dir: Optional[str] = None, cache_max_bytes: int = 1024 ** 3,
+                 cache_ttl: Optional[float] = None, extractor: str = 'auto', convert_workers: int = 0,
+                 fakeid_cache_file: Optional[str] = 'fakeid_cache.json', account_select: str = 'auto',
+                 search_rate: float = 0.2, cookie_save_interval: float = 10,
+                 output_format: str = 'csv', output_compression: Optional[str] = None, output_dir: str = '.',
+                 flush_rows: int = 20, flush_interval: float = 5, metrics_file: Optional[str] = None,
+                 metrics_port: Optional[int] = None, profile_stages: List[str] = None,
+                 profile_dir: str = 'profiles', base_url: str = 'https://mp.weixin.qq.com',
+                 cookie_file: str = 'account_cookie.txt', max_rate: Optional[float] = None,
+                 max_retries: int = 5, cookie_files: List[str] = None, credential_rate: Optional[float] = None,
+                 work_queue: Optional[str] = None, work_queue_backend: str = 'sqlite', lease_ttl: float = 300,
+                 max_attempts: int = 3, since: Optional[str] = None, until: Optional[str] = None,
+                 since_last_run: bool = False, asset_dir: Optional[str] = None, asset_workers: int = 8,
+                 dedup_file: Optional[str] = None, dedup_distance: int = 3, daemon: bool = False,
+                 poll_min_interval: float = 600, poll_max_interval: float = 86400, poll_factor: float = 0.5,
+                 search_index: Optional[str] = None):
         """
         初始化微信公众号爬虫
         :param account_list: 要爬取的公众号列表
         :param chrome_driver_path: ChromeDriver路径，如果不指定则从环境变量获取
         :param max_articles: 每个公众号最多取的文章数量，默认为5
+        :param pool_size: 每个主机保持的长连接数量，默认为10
+        :param timeout: 请求默认超时时间(秒)，默认为20
+        :param workers: 并发获取文章内容的线程数，默认为4
+        :param rate: 全局每秒请求数，默认为1
+        :param host_rate: 单个主机每秒请求数，默认不单独限制
+        :param queue_size: 流水线各阶段之间的队列长度，默认为10
+        :param account_workers: 同时爬取的公众号数量，默认为1
+        :param state_file: 爬取状态数据库路径，为空时每次全量爬取并覆盖CSV
+        :param cache_dir: 文章页面缓存目录，默认不缓存
+        :param cache_max_bytes: 文章页面缓存大小上限(字节)，默认1GB
+        :param cache_ttl: 文章页面缓存有效期(秒)，默认永不过期
+        :param extractor: 正文提取后端 bs4/strainer/lxml，默认 auto
+        :param convert_workers: 解析和转换 markdown 的进程数，默认为0即在线程中转换
+        :param fakeid_cache_file: 公众号fakeid缓存文件，为空时不保存
+        :param account_select: 搜索结果的选择方式，auto 自动选择名称一致的公众号，prompt 由用户选择
+        :param search_rate: 搜索公众号的每秒请求数，默认为0.2
+        :param cookie_save_interval: cookies写入文件的最小间隔(秒)，默认为10
+        :param output_format: 输出格式 csv/jsonl/parquet，默认为csv
+        :param output_compression: jsonl 输出的压缩方式 gzip/zstd，默认不压缩
+        :param output_dir: 输出目录，默认为当前目录
+        :param flush_rows: 输出缓冲的最大文章数，默认为20
+        :param flush_interval: 输出缓冲的最长时间(秒)，默认为5
+        :param metrics_file: 运行结束时写入 Prometheus 指标的文件，默认不写
+        :param metrics_port: Prometheus 指标 HTTP 服务端口，默认不启动
+        :param profile_stages: 需要 cProfile 采样的阶段，如 list/fetch/write
+        :param profile_dir: cProfile 结果保存目录
+        :param base_url: 公众号平台地址，基准测试时指向本地模拟服务
+        :param cookie_file: cookies文件路径
+        :param max_rate: 自适应调整时的最高每秒请求数，默认等于rate
+        :param max_retries: 被限流或网络错误时的最大重试次数，默认为5
+        :param cookie_files: 多个登录账号的cookies文件，接口请求在这些账号之间分配，默认只用cookie_file
+        :param credential_rate: 每个登录账号调用接口的每秒请求数，默认等于rate
+        :param work_queue: 多个进程共享的任务队列位置，设置后从队列领取公众号，默认不使用
+        :param work_queue_backend: 任务队列后端，默认为sqlite
+        :param lease_ttl: 领取公众号的租约有效期(秒)，默认为300
+        :param max_attempts: 每个公众号的最大尝试次数，默认为3
+        :param since: 只爬取该时间及之后发布的文章，时间戳或 YYYY-MM-DD[ HH:MM[:SS]]
+        :param until: 只爬取该时间及之前发布的文章，格式同 since
+        :param since_last_run: 只爬取上次运行保存的最新文章之后发布的文章，需要启用爬取状态
+        :param asset_dir: 图片保存目录，设置后下载文章中的图片并把内容中的地址改为本地路径，默认不下载
+        :param asset_workers: 并发下载图片的线程数，默认为8
+        :param dedup_file: 相似文章索引数据库路径，设置后内容与已保存文章相近的文章只保存引用，默认不去重
+        :param dedup_distance: 视为相同文章的 simhash 最大海明距离，默认为3
+        :param daemon: 是否常驻运行，按各公众号的发文频率反复轮询，默认运行一遍后退出
+        :param poll_min_interval: 常驻运行时同一公众号的最短轮询间隔(秒)，默认为600
+        :param poll_max_interval: 常驻运行时同一公众号的最长轮询间隔(秒)，默认为86400
+        :param poll_factor: 期望每次轮询发现的新文章数，越小轮询越频繁，默认为0.5
+        :param search_index: 全文索引数据库路径，设置后保存的文章同时加入索引，默认不建索引
         """
         self.account_list = account_list
         # 优先级：参数 > .env文件 > 系统环境变量
@@ -45,13 +2213,240 @@ class WeixinCrawler:
         if not self.chrome_driver_path:
             raise ValueError("请在 .env 文件中设置 CHROME_DRIVER_PATH 或在初始化时提供 chrome_driver_path")
         self.max_articles = max_articles
-        self.cookie_file = Path('account_cookie.txt')
-        self.base_url = 'https://mp.weixin.qq.com'
+        self.cookie_file = Path(cookie_file)
+        self.base_url = base_url.rstrip('/')
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8'
+            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+            'Accept-Encoding': ACCEPT_ENCODING,
         }
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.metrics = Metrics(profile_stages)
+        self.metrics_file = metrics_file
+        self.metrics_port = metrics_port
+        self.profile_dir = profile_dir
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.rate_limiter = RateLimiter(rate, host_rate)
+        # 被限流时最多降到设定速率的 1/10
+        self.throttle = ThrottleController(self.rate_limiter.global_bucket, min_rate=rate / 10,
+                                           max_rate=max_rate or rate)
+        # 图片来自其他主机，单独调整速率，图片服务器的限流不影响文章请求
+        self.asset_throttle = ThrottleController(TokenBucket(rate), min_rate=rate / 10, max_rate=max_rate or rate)
+        self.max_retries = max_retries
+        self.queue_size = queue_size
+        self.account_workers = account_workers
+        self.credentials = self._init_credentials(cookie_files or [cookie_file], credential_rate or rate,
+                                                  max_rate or credential_rate or rate, cookie_save_interval)
+        # 第一个账号的会话同时用于获取文章页面
+        self.session_manager = self.credentials.credentials[0].manager
+        self.input_lock = threading.Lock()
+        if output_format not in SINKS:
+            raise ValueError(f"未知的输出格式: {output_format}，可选: {', '.join(SINKS)}")
+        self.output_format = output_format
+        self.output_compression = output_compression
+        self.output_dir = output_dir
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        self.state = CrawlStateStore(state_file) if state_file else None
+        self.cache = ArticleCache(cache_dir, cache_max_bytes, cache_ttl) if cache_dir else None
+        self.extractor = resolve_extractor(extractor)
+        self.fakeid_cache = FakeidCache(fakeid_cache_file)
+        if account_select not in ('auto', 'prompt'):
+            raise ValueError(f"未知的公众号选择方式: {account_select}，可选: auto, prompt")
+        self.account_select = account_select
+        self.search_bucket = TokenBucket(search_rate, capacity=1)
+        self.convert_pool = ProcessPoolExecutor(max_workers=convert_workers) if convert_workers > 0 else None
+        self.work_queue = create_work_queue(work_queue_backend, work_queue,
+                                            max_attempts=max_attempts) if work_queue else None
+        self.lease_ttl = lease_ttl
+        self.since = parse_time(since)
+        self.until = parse_time(until)
+        self.since_last_run = since_last_run
+        self.assets = AssetStore(asset_dir) if asset_dir else None
+        self.asset_executor = ThreadPoolExecutor(max_workers=asset_workers) if asset_dir else None
+        # 正在下载的图片，同一地址同时只下载一次
+        self.asset_downloads: Dict[str, Future] = {}
+        self.asset_lock = threading.Lock()
+        self.dedup = DedupIndex(dedup_file, dedup_distance) if dedup_file else None
+        if daemon and not state_file:
+            raise ValueError("常驻运行需要启用爬取状态(state_file)")
+        if daemon and work_queue:
+            raise ValueError("常驻运行不能与任务队列同时使用")
+        self.scheduler = PollScheduler(account_list, poll_min_interval, poll_max_interval, poll_factor,
+                                       store=self.state) if daemon else None
+        self.stopping = threading.Event()
+        self.search_index = SearchIndex(search_index) if search_index else None
+        self.worker_id = f'{socket.gethostname()}-{os.getpid()}'
+        self.leases: Dict[str, str] = {}
+        # 本进程的租约结束时通知等待中的线程，released 为已结束的租约数
+        self.leases_lock = threading.Condition()
+        self.leases_released = 0
+
+    def _init_credentials(self, cookie_files: List[str], rate: float, max_rate: float,
+                          save_interval: float) -> CredentialPool:
+        """
+        为每个cookies文件创建独立的会话和请求配额
+        :param cookie_files: cookies文件列表
+        :param rate: 每个账号的每秒请求数
+        :param max_rate: 自适应调整时每个账号的最高每秒请求数
+        :param save_interval: cookies写入文件的最小间隔(秒)
+        :return: 登录凭证池
+        """
+        credentials = []
+        for cookie_file in cookie_files:
+            cookie_file = Path(cookie_file)
+            session = self._init_session()
+            if not credentials:
+                self.session = session
+            bucket = TokenBucket(rate)
+            throttle = ThrottleController(bucket, min_rate=rate / 10, max_rate=max_rate)
+            manager = SessionManager(session, cookie_file, self.base_url, self._request, save_interval)
+            credentials.append(Credential(cookie_file.stem, manager, bucket, throttle))
+        return CredentialPool(credentials, lambda credential: self.login(credential.manager))
+
+    def _init_session(self) -> requests.Session:
+        """
+        初始化HTTP会话，同一账号的请求复用同一个连接池和cookie
+        :return: requests会话
+        """
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = TimeoutHTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            timeout=self.timeout
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _request(self, url: str, manager: SessionManager = None, stage: Optional[str] = None,
+                 **kwargs) -> requests.Response:
+        """
+        经过限流的GET请求
+        :param url: 请求地址
+        :param manager: 使用哪个账号的会话，默认为第一个账号
+        :param stage: 阶段名称，指定时把网络请求的耗时记入该阶段，不含限流等待
+        :return: 响应
+        """
+        manager = manager or self.session_manager
+        self.metrics.observe('rate_limit_wait_seconds', self.rate_limiter.wait(url), host=urlparse(url).netloc)
+        with self.metrics.timer(stage) if stage else nullcontext():
+            response = manager.session.get(url, **kwargs)
+        self.metrics.inc('bytes_total', len(response.content), host=urlparse(url).netloc)
+        # 会话已自动合并新的cookies，稍后同步到本地文件
+        if response.cookies:
+            manager.mark_dirty()
+        return response
+
+    def _controlled_get(self, url: str, endpoint: str, api: bool = False, retries: int = None,
+                        throttle: ThrottleController = None, manager: SessionManager = None,
+                        stage: Optional[str] = None, **kwargs) -> Tuple[str, requests.Response, Optional[Dict]]:
+        """
+        经过熔断和重试的GET请求，被限流或网络错误时按退避时间重试
+        :param url: 请求地址
+        :param endpoint: 接口名称，用于熔断和指标
+        :param api: 是否为 JSON 接口，是则按 base_resp.ret 判断结果
+        :param retries: 最大重试次数，默认为 max_retries
+        :param throttle: 记录请求结果的控制器，默认为全局控制器
+        :param manager: 使用哪个账号的会话，默认为第一个账号
+        :param stage: 记录网络耗时的阶段名称，退避和限流等待不计入
+        :return: (请求结果分类, 响应, JSON 数据)
+        """
+        retries = self.max_retries if retries is None else retries
+        throttle = throttle or self.throttle
+        for attempt in range(retries + 1):
+            throttle.wait(endpoint)
+            try:
+                response = self._request(url, manager, stage, **kwargs)
+                data = response.json() if api else None
+                ret = data.get('base_resp', {}).get('ret') if data else None
+                if api:
+                    self.metrics.inc('base_resp_total', endpoint=endpoint, ret=ret)
+                outcome = throttle.classify(response.status_code, ret)
+                error = None
+            except (requests.RequestException, ValueError) as e:
+                outcome, error = OUTCOME_TRANSIENT, e
+            except BaseException:
+                throttle.cancel(endpoint)
+                raise
+            throttle.record(endpoint, outcome)
+            self.metrics.inc('outcomes_total', endpoint=endpoint, outcome=outcome)
+            if outcome not in (OUTCOME_THROTTLED, OUTCOME_TRANSIENT):
+                return outcome, response, data
+            if attempt < retries:
+                delay = throttle.backoff(attempt)
+                logger.warning(f"请求 {endpoint} 失败({error or ret or response.status_code})，"
+                               f"{delay:.1f} 秒后第 {attempt + 1} 次重试")
+                time.sleep(delay)
+        if error:
+            raise error
+        return outcome, response, data
+
+    def _api_get(self, url: str, params: Dict, stage: Optional[str] = None) -> Dict:
+        """
+        请求公众号平台的 JSON 接口，从凭证池中选择账号并带上其 token
+        被限流或登录失效时换用其他账号重试，所有账号都不可用时等待冷却或重新登录
+        :param url: 接口地址
+        :param params: 请求参数
+        :param stage: 记录网络耗时的阶段名称
+        :return: 响应数据
+        """
+        endpoint = url.rsplit('/', 1)[-1]
+        data, error = None, None
+        for attempt in range(self.max_retries + 1):
+            credential = self.credentials.acquire()
+            outcome, data, error = OUTCOME_FATAL, None, None
+            try:
+                outcome, data = self._credential_get(credential, url, endpoint, params, stage)
+            except (requests.RequestException, ValueError) as e:
+                outcome, error = OUTCOME_TRANSIENT, e
+            finally:
+                # 其他异常向上抛出前也要归还凭证，否则该账号的并发数一直偏高
+                self.credentials.release(credential, outcome)
+            self.metrics.inc('credential_requests_total', credential=credential.name, outcome=outcome)
+            if outcome not in (OUTCOME_THROTTLED, OUTCOME_TRANSIENT, OUTCOME_AUTH_EXPIRED):
+                return data
+            if attempt < self.max_retries:
+                logger.warning(f"登录账号 {credential.name} 请求 {endpoint} 失败({error or outcome})，"
+                               f"第 {attempt + 1} 次重试")
+                # 被限流的账号由凭证池冷却，服务端错误和网络错误在这里退避
+                if outcome == OUTCOME_TRANSIENT:
+                    time.sleep(credential.throttle.backoff(attempt))
+        if error:
+            raise error
+        return data
+
+    def _credential_get(self, credential: Credential, url: str, endpoint: str,
+                        params: Dict, stage: Optional[str] = None) -> Tuple[str, Optional[Dict]]:
+        """
+        用指定账号请求接口，登录失效时刷新 token 重试一次
+        :param credential: 登录凭证
+        :param url: 接口地址
+        :param endpoint: 接口名称
+        :param params: 请求参数
+        :param stage: 记录网络耗时的阶段名称
+        :return: (请求结果分类, 响应数据)
+        """
+        manager = credential.manager
+        token = manager.get_token()
+        outcome, data = OUTCOME_AUTH_EXPIRED, None
+        for attempt in range(2):
+            if not token:
+                break
+            params['token'] = token
+            self.metrics.observe('credential_wait_seconds', credential.bucket.acquire(), credential=credential.name)
+            # 限流时由凭证池换用其他账号，这里不重试
+            outcome, _, data = self._controlled_get(url, endpoint, api=True, retries=0, throttle=credential.throttle,
+                                                    manager=manager, stage=stage, params=params)
+            if outcome != OUTCOME_AUTH_EXPIRED or attempt:
+                break
+            token = manager.refresh_token(token)
+        return outcome, data
 
     def _init_chrome_driver(self) -> webdriver.Chrome:
         """初始化Chrome浏览器"""
@@ -93,24 +2488,26 @@ class WeixinCrawler:
         
         raise TimeoutException("无法获取所需的全部cookies")
 
-    def _get_qrcode(self, cookie_dict: Dict[str, str]) -> bool:
+    def _get_qrcode(self, cookie_dict: Dict[str, str], manager: SessionManager,
+                    qrcode_file: str = 'qrcode.png') -> bool:
         """
         获取登录二维码
         :param cookie_dict: cookie字典
+        :param manager: 正在登录的账号
+        :param qrcode_file: 二维码保存路径
         :return: 是否成功获取二维码
         """
-        headers = self.headers.copy()
-        headers['Cookie'] = '; '.join([f"{k}={v}" for k, v in cookie_dict.items()])
+        manager.session.cookies.update(cookie_dict)
         
         random_timestamp = str(int(time.time() * 1000))
         qrcode_url = f'{self.base_url}/cgi-bin/scanloginqrcode?action=getqrcode&random={random_timestamp}'
         
         try:
-            response = requests.get(qrcode_url, headers=headers)
+            response = manager.session.get(qrcode_url)
             if response.status_code == 200:
-                with open('qrcode.png', 'wb') as f:
+                with open(qrcode_file, 'wb') as f:
                     f.write(response.content)
-                logger.info("二维码已保存到 qrcode.png")
+                logger.info(f"二维码已保存到 {qrcode_file}")
                 return True
             else:
                 logger.error(f"获取二维码失败，状态码: {response.status_code}")
@@ -119,20 +2516,23 @@ class WeixinCrawler:
             logger.error(f"获取二维码时发生错误: {e}")
             return False
 
-    def _verify_cookies(self, cookies: Dict[str, str]) -> bool:
+    def _verify_cookies(self, cookies: Dict[str, str], manager: SessionManager) -> bool:
         """
         验证cookies是否有效
         :param cookies: cookies字典
+        :param manager: cookies所属的账号
         :return: cookies是否有效
         """
         try:
             # 尝试访问主页
-            response = requests.get(self.base_url, cookies=cookies, headers=self.headers)
+            manager.session.cookies.update(cookies)
+            response = manager.session.get(self.base_url)
             
-            # 如果能获取到token，说明cookie有效
-            token = re.findall(r'token=(\d+)', str(response.url))
+            # 如果能获取到token，说明cookie有效，直接保存token省去再次请求
+            token = manager.parse_token(response)
             if token:
                 logger.info("当前cookies仍然有效")
+                manager.set_token(token)
                 return True
             
             logger.info("cookies已失效")
@@ -142,16 +2542,17 @@ class WeixinCrawler:
             logger.error(f"验证cookies时发生错误: {e}")
             return False
 
-    def _check_login_status(self, cookie_dict: Dict[str, str], max_wait_time: int = 120) -> bool:
+    def _check_login_status(self, cookie_dict: Dict[str, str], manager: SessionManager,
+                            max_wait_time: int = 120) -> bool:
         """
         检查扫码登录状态
         :param cookie_dict: cookie字典
+        :param manager: 正在登录的账号
         :param max_wait_time: 最大等待时间(秒)
         :return: 是否登录成功
         """
-        headers = self.headers.copy()
-        headers['Cookie'] = '; '.join([f"{k}={v}" for k, v in cookie_dict.items()])
-        url = 'https://mp.weixin.qq.com/cgi-bin/scanloginqrcode'
+        manager.session.cookies.update(cookie_dict)
+        url = f'{self.base_url}/cgi-bin/scanloginqrcode'
         params = {
             'action': 'ask',
             'token': '',
@@ -163,7 +2564,7 @@ class WeixinCrawler:
         start_time = time.time()
         while time.time() - start_time < max_wait_time:
             try:
-                response = requests.get(url=url, params=params, headers=headers)
+                response = manager.session.get(url=url, params=params)
                 res = response.json()
                 
                 if res.get('status') == 0:
@@ -185,18 +2586,21 @@ class WeixinCrawler:
         logger.error("登录超时")
         return False
 
-    def login(self) -> bool:
+    def login(self, manager: SessionManager = None) -> bool:
         """
         执行登录流程
+        :param manager: 要登录的账号，默认为第一个账号
         :return: 是否登录成功
         """
+        manager = manager or self.session_manager
+        # 其他账号的二维码单独保存，便于区分正在登录的是哪个账号
+        qrcode_file = 'qrcode.png' if manager is self.session_manager else f'qrcode_{manager.cookie_file.stem}.png'
         # 首先检查是否存在cookie文件
-        if self.cookie_file.exists():
+        if manager.cookie_file.exists():
             try:
-                with open(self.cookie_file, 'r', encoding='utf-8') as f:
-                    cookies = json.load(f)
+                cookies = manager.load()
                 # 验证现有cookie是否有效
-                if self._verify_cookies(cookies):
+                if self._verify_cookies(cookies, manager):
                     return True
                 logger.info("现有cookies已失效，需要重新登录")
             except Exception as e:
@@ -209,20 +2613,19 @@ class WeixinCrawler:
             browser.get(self.base_url)
             
             cookie_dict = self._wait_for_cookies(browser)
-            if not self._get_qrcode(cookie_dict):
+            if not self._get_qrcode(cookie_dict, manager, qrcode_file):
                 return False
             
             # 替换固定等待为状态检查
-            if not self._check_login_status(cookie_dict):
+            if not self._check_login_status(cookie_dict, manager):
                 return False
             
             # 保存登录后的cookies
             browser.get(self.base_url)
             cookies = browser.get_cookies()
             cookie_dict = {cookie['name']: cookie['value'] for cookie in cookies}
-            
-            with open(self.cookie_file, 'w', encoding='utf-8') as f:
-                json.dump(cookie_dict, f)
+            manager.update(cookie_dict)
+            manager.flush()
             logger.info("登录cookies已保存到本地")
             
             return True
@@ -234,174 +2637,522 @@ class WeixinCrawler:
             if browser:
                 browser.quit()
 
-    def _get_token(self, cookies: Dict[str, str]) -> Optional[str]:
-        """获取token"""
-        try:
-            response = requests.get(self.base_url, cookies=cookies, headers=self.headers)
-
-            token = re.findall(r'token=(\d+)', str(response.url))[0]
-            print(f"token: {token}")
-            return token
-        except Exception as e:
-            logger.error(f"获取token失败: {e}")
-            return None
+    @staticmethod
+    def _parse_account(account: str) -> Tuple[str, Optional[str]]:
+        """
+        解析 ACCOUNT_LIST 中的一项，支持 "名称:fakeid" 的形式直接指定fakeid
+        :param account: 公众号配置
+        :return: (公众号名称, fakeid)，未指定fakeid时为 None
+        """
+        name, sep, fakeid = account.strip().rpartition(':')
+        if sep and name and fakeid:
+            return name, fakeid
+        return account.strip(), None
 
-    def _get_account_fakeid(self, account: str, token: str, cookies: Dict[str, str]) -> Optional[str]:
+    def _get_account_fakeid(self, account: str) -> Optional[str]:
         """
-        获取公众号fakeid，更新cookies
+        获取公众号fakeid
+        优先使用本地缓存，缓存中没有时才调用 searchbiz 搜索
         :param account: 公众号名称
-        :param token: token
-        :param cookies: cookies
         :return: 选中的公众号fakeid
         """
+        cached = self.fakeid_cache.get(account)
+        if cached:
+            logger.info(f"使用缓存的fakeid: {account} -> {cached['nickname']}")
+            return cached['fakeid']
+        
         search_url = f'{self.base_url}/cgi-bin/searchbiz'
         params = {
             'action': 'search_biz',
             'begin': '0',
             'count': '5',
             'query': account,
-            'token': token,
             'lang': 'zh_CN',
             'f': 'json',
             'ajax': '1',
         }
         
         try:
-            response = requests.get(search_url, cookies=cookies, headers=self.headers, params=params)
-            
-            # 获取并更新cookies
-            new_cookies = response.cookies.get_dict()
-            if new_cookies:
-                cookies.update(new_cookies)
-                # 保存更新后的cookies到本地
-                with open(self.cookie_file, 'w', encoding='utf-8') as f:
-                    json.dump(cookies, f)
-                logger.info("已更新本地cookies")
-            
-            account_list = response.json().get('list', [])
+            # 搜索接口频率限制更严格，单独限速
+            self.metrics.observe('rate_limit_wait_seconds', self.search_bucket.acquire(), host='searchbiz')
+            account_list = self._api_get(search_url, params).get('list', [])
             
             if not account_list:
                 logger.error(f"未找到与 '{account}' 相关的公众号")
                 return None
                 
-            # 打印搜索结果
-            logger.info(f"\n找到 {len(account_list)} 个相关公众号:")
-            print("\n序号  公众号名称  认证信息  简介")
-            print("-" * 50)
-            
-            for idx, acc in enumerate(account_list, 1):
-                nickname = acc.get('nickname', '未知')
-                signature = acc.get('signature', '无')
-                verified = "已认证" if acc.get('verified', False) else "未认证"
-                print(f"{idx:<4} {nickname:<10} {verified:<6} {signature}")
+            if self.account_select == 'auto':
+                selected = self._match_account(account, account_list)
+            else:
+                # 并行爬取时避免多个公众号的选择提示交错
+                with self.input_lock:
+                    selected = self._select_account(account_list)
+            if not selected:
+                return None
                 
-            # 用户选择
-            while True:
-                try:
-                    choice = input("\n请输入要爬取的公众号序号 (输入 q 退出): ")
-                    if choice.lower() == 'q':
-                        return None
-                        
-                    choice_idx = int(choice) - 1
-                    if 0 <= choice_idx < len(account_list):
-                        selected = account_list[choice_idx]
-                        logger.info(f"已选择: {selected['nickname']}")
-                        return selected['fakeid']
-                    else:
-                        print("无效的序号，请重新输入")
-                except ValueError:
-                    print("请输入有效的数字")
-                except KeyboardInterrupt:
-                    print("\n已取消选择")
-                    return None
+            self.fakeid_cache.set(account, selected['fakeid'], selected.get('nickname', ''),
+                                  bool(selected.get('verified', False)))
+            return selected['fakeid']
                 
         except Exception as e:
             logger.error(f"获取公众号fakeid失败: {e}")
             return None
 
-    def crawl_articles(self, account: str) -> bool:
+    def _match_account(self, account: str, account_list: List[Dict]) -> Optional[Dict]:
         """
-        爬取指定公众号的文章
+        自动选择公众号：名称完全一致的结果中优先选择已认证的
         :param account: 公众号名称
+        :param account_list: searchbiz 返回的公众号列表
+        :return: 选中的公众号，没有名称完全一致的结果时返回 None
+        """
+        matched = [acc for acc in account_list if acc.get('nickname', '').strip() == account]
+        if not matched:
+            candidates = ', '.join(acc.get('nickname', '未知') for acc in account_list)
+            logger.error(f"没有名称为 '{account}' 的公众号，搜索结果: {candidates}，"
+                         f"可在 ACCOUNT_LIST 中使用 '名称:fakeid' 指定")
+            return None
+        matched.sort(key=lambda acc: not acc.get('verified', False))
+        selected = matched[0]
+        logger.info(f"已自动选择: {selected['nickname']}")
+        return selected
+
+    def _select_account(self, account_list: List[Dict]) -> Optional[Dict]:
+        """
+        打印搜索结果并由用户选择公众号
+        :param account_list: searchbiz 返回的公众号列表
+        :return: 选中的公众号
+        """
+        # 打印搜索结果
+        logger.info(f"\n找到 {len(account_list)} 个相关公众号:")
+        print("\n序号  公众号名称  认证信息  简介")
+        print("-" * 50)
+        
+        for idx, acc in enumerate(account_list, 1):
+            nickname = acc.get('nickname', '未知')
+            signature = acc.get('signature', '无')
+            verified = "已认证" if acc.get('verified', False) else "未认证"
+            print(f"{idx:<4} {nickname:<10} {verified:<6} {signature}")
+            
+        # 用户选择
+        while True:
+            try:
+                choice = input("\n请输入要爬取的公众号序号 (输入 q 退出): ")
+                if choice.lower() == 'q':
+                    return None
+                    
+                choice_idx = int(choice) - 1
+                if 0 <= choice_idx < len(account_list):
+                    selected = account_list[choice_idx]
+                    logger.info(f"已选择: {selected['nickname']}")
+                    return selected
+                else:
+                    print("无效的序号，请重新输入")
+            except ValueError:
+                print("请输入有效的数字")
+            except KeyboardInterrupt:
+                print("\n已取消选择")
+                return None
+
+    def _warm_fakeid_cache(self):
+        """爬取前依次解析缓存中还没有的公众号fakeid"""
+        unresolved = []
+        for account in self.account_list:
+            name, fakeid = self._parse_account(account)
+            if not fakeid and not self.fakeid_cache.get(name) and name not in unresolved:
+                unresolved.append(name)
+        if not unresolved:
+            return
+        logger.info(f"需要搜索fakeid的公众号: {len(unresolved)} 个")
+        for name in unresolved:
+            self._get_account_fakeid(name)
+
+    def crawl_articles(self, account: str, listing: Dict = None) -> bool:
+        """
+        爬取指定公众号的文章
+        :param account: 公众号名称，或 "名称:fakeid"
+        :param listing: 传入时记录列表的结果，publish_times 为列表中文章的发布时间
         :return: 是否成功爬取
         """
         try:
-            # 每次都重新读取cookies，确保使用最新的
-            with open(self.cookie_file, 'r', encoding='utf-8') as f:
-                cookies = json.load(f)
-            
-            token = self._get_token(cookies)
-            print(f"token: {token}")
-            if not token:
-                return False
-                
-            fakeid = self._get_account_fakeid(account, token, cookies)
+            name, fakeid = self._parse_account(account)
+            if not fakeid:
+                fakeid = self._get_account_fakeid(name)
             if not fakeid:
                 return False
             
-            # 重新读取更新后的cookies
-            with open(self.cookie_file, 'r', encoding='utf-8') as f:
-                cookies = json.load(f)
-            
-            return self._save_articles(account, fakeid, token, cookies)
+            return self._save_articles(name, fakeid, listing)
             
         except Exception as e:
             logger.error(f"爬取文章过程中发生错误: {e}")
             return False
 
-    def _save_articles(self, account: str, fakeid: str, token: str, cookies: Dict[str, str]) -> bool:
-        """保存公众号文章"""
-        file_name = f'{account}.csv'
-        file_head = ['title', 'link', 'content']
+    def _save_articles(self, account: str, fakeid: str, listing: Dict = None) -> bool:
+        """
+        保存公众号文章
+        列表、下载、解析、写入四个阶段通过有界队列串联，各阶段并行执行
+        启用爬取状态时只追加新文章，并从上次中断的位置继续
+        :param listing: 记录列表是否正常结束和列表中文章的发布时间
+        """
         articles_saved = 0  # 记录已保存的文章数量
         
+        stop = threading.Event()
+        listing = {} if listing is None else listing
+        listing.update(complete=False, publish_times=[])
+        listed_queue = queue.Queue(maxsize=self.queue_size)
+        fetched_queue = queue.Queue(maxsize=self.queue_size)
+        parsed_queue = queue.Queue(maxsize=self.queue_size)
+        stages = [
+            threading.Thread(target=self._list_stage, args=(fakeid, listed_queue, stop, listing), daemon=True),
+            threading.Thread(target=self._fetch_stage, args=(listed_queue, fetched_queue, stop), daemon=True),
+            threading.Thread(target=self._parse_stage, args=(account, fetched_queue, parsed_queue, stop),
+                             daemon=True),
+        ]
+        if self.assets:
+            # 启用图片下载时在解析和写入之间增加资源阶段
+            converted_queue, parsed_queue = parsed_queue, queue.Queue(maxsize=self.queue_size)
+            stages.append(threading.Thread(target=self._asset_stage, args=(converted_queue, parsed_queue, stop),
+                                           daemon=True))
+        for stage in stages:
+            stage.start()
+        
         try:
-            with open(file_name, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.DictWriter(f, file_head)
-                writer.writeheader()
-                
-                begin = 0
+            # 增量模式下追加写入；每批文章真正写出后才记录到爬取状态和全文索引
+            # 下载或解析失败的文章中最靠前的页，翻页位置不越过这里，下次运行重试
+            failed = {'begin': None}
+            on_flush = None
+            if self.state or self.search_index:
+                def on_flush(rows):
+                    # 放弃重试的文章已经由 skip_article 记录，不进入索引和爬取状态
+                    rows = [row for row in rows if not row['failed']]
+                    if self.search_index:
+                        with self.metrics.timer('index'):
+                            self.search_index.add(account, rows)
+                    if self.state:
+                        for row in rows:
+                            begin = row['begin'] if failed['begin'] is None else min(row['begin'], failed['begin'])
+                            self.state.save_article(fakeid, row, begin)
+            with self._create_sink(account, on_flush) as sink:
                 while True:
-                    articles = self._get_articles_batch(fakeid, token, cookies, begin)
-                    if not articles:
-                        break
-                    
-                    for article in articles['list']:
-                        if articles_saved >= self.max_articles:
-                            logger.info(f"已达到最大文章数量限制: {self.max_articles}")
-                            return True
-                            
-                        try:
-                            content = self._get_article_content(article['link'], cookies)
-                            article['content'] = content
-                            writer.writerow(article)  # 立即写入每篇文章
-                            articles_saved += 1
-                            logger.info(f"成功获取文章内容 ({articles_saved}/{self.max_articles}): {article['title']}")
-                        except Exception as e:
-                            logger.error(f"获取文章内容失败: {article['title']}, 错误: {e}")
-                            article['content'] = ''
-                        
-                        time.sleep(random.uniform(2, 4))
-                    
-                    if articles_saved >= self.max_articles:
+                    item = parsed_queue.get()
+                    if item is _DONE:
                         break
-                        
-                    begin += 5
-                    time.sleep(2)
+                    article, content, downloads = item
+                    if isinstance(content, Future):
+                        content = self._wait_converted(content, article['link'])
+                    article['failed'] = not content
+                    if article['failed'] and self.state and self._retry_later(fakeid, article):
+                        if failed['begin'] is None:
+                            failed['begin'] = article['begin']
+                        continue
+                    if downloads:
+                        content = self._localize_assets(content, downloads)
+                    article['content'] = content
+                    with self.metrics.timer('write'):
+                        sink.write(article)
+                    self.metrics.inc('articles_total')
+                    articles_saved += 1
+                    logger.info(f"成功获取文章内容 ({articles_saved}/{self.max_articles}): {article['title']}")
             
+            if self.state and failed['begin'] is not None:
+                self.state.save_cursor(fakeid, failed['begin'])
+            elif self.state and listing['complete']:
+                self.state.clear_cursor(fakeid)
             logger.info(f"共成功保存 {articles_saved} 篇文章")
             return True
             
         except Exception as e:
             logger.error(f"保存文章时发生错误: {e}")
             return False
+        finally:
+            stop.set()
+            for stage in stages:
+                stage.join()
+
+    def _retry_later(self, fakeid: str, article: Dict) -> bool:
+        """
+        处理下载或解析失败的文章：不写出也不记录为已爬取，留到下次运行重试
+        连续失败 MAX_ARTICLE_FAILURES 次后放弃，避免翻页位置一直停在这篇文章
+        :return: 是否留到下次重试，放弃时返回 False，文章按空内容写出
+        """
+        attempts = self.state.record_failure(fakeid, article['link'])
+        if attempts >= MAX_ARTICLE_FAILURES:
+            logger.error(f"文章已连续 {attempts} 次获取失败，不再重试: {article['title']}")
+            self.state.skip_article(fakeid, article)
+            return False
+        logger.warning(f"文章获取失败，下次运行重试 ({attempts}/{MAX_ARTICLE_FAILURES}): {article['title']}")
+        return True
+
+    def _create_sink(self, account: str, on_flush: Callable[[List[Dict]], None] = None) -> ArticleSink:
+        """
+        创建公众号的文章输出
+        :param account: 公众号名称
+        :param on_flush: 每批文章写出后的回调
+        :return: 文章输出
+        """
+        fields = ['title', 'link', 'author', 'digest', 'cover', 'create_time', 'update_time', 'idx', 'content',
+                  'duplicate_of']
+        return create_sink(self.output_format, account, fields, append=self.state is not None,
+                           compression=self.output_compression, output_dir=self.output_dir,
+                           flush_rows=self.flush_rows, flush_interval=self.flush_interval, on_flush=on_flush)
+
+    @staticmethod
+    def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+        """
+        向有界队列放入数据，队列满时阻塞，直到放入成功或收到停止信号
+        :return: 是否放入成功
+        """
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _get(q: queue.Queue, stop: threading.Event):
+        """从队列取数据，收到停止信号时返回 _DONE"""
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _list_stage(self, fakeid: str, out_queue: queue.Queue, stop: threading.Event,
+                    listing: Dict):
+        """
+        列表阶段：翻页获取文章列表，提前预取后续页面
+        全新爬取遇到已爬取的文章即停止翻页；续爬时跳过已爬取的文章
+        :param listing: 列表正常结束时把 complete 置为 True，publish_times 记录列表中文章的发布时间
+        """
+        listed = 0
+        begin = 0
+        resumed = False
+        since = self.since
+        try:
+            # 读取爬取状态也可能出错，放在 try 中保证总会向下游发送结束标记
+            if self.state:
+                cursor = self.state.get_cursor(fakeid)
+                if cursor is not None:
+                    begin = cursor
+                    resumed = True
+                    logger.info(f"从上次中断的位置继续爬取: begin={begin}")
+                # 续爬时上次保存的最新文章比剩下的文章都新，不能再用它过滤
+                last_publish_time = (self.state.get_last_publish_time(fakeid)
+                                     if self.since_last_run and not resumed else None)
+                if last_publish_time is not None and (since is None or last_publish_time >= since):
+                    since = last_publish_time + 1
+                    logger.info(f"只爬取 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_publish_time))} 之后发布的文章")
+            while listed < self.max_articles and not stop.is_set():
+                articles = self._get_articles_batch(fakeid, begin)
+                if articles is None:
+                    self.metrics.inc('errors_total', stage='list')
+                    if self.state:
+                        logger.error(f"文章列表获取失败，下次运行将从 begin={begin} 继续")
+                    else:
+                        logger.error(f"文章列表获取失败，只爬取了前 {listed} 篇文章")
+                    return
+                if not articles['list']:
+                    break
+                listing['publish_times'].extend(article.get('create_time') for article in articles['list'])
+                reached_seen = False
+                for article in articles['list']:
+                    if listed >= self.max_articles:
+                        break
+                    if not self._in_window(article, since):
+                        self.metrics.inc('filtered_total')
+                        continue
+                    if self.state and self.state.has_article(fakeid, article['link']):
+                        if resumed:
+                            continue
+                        reached_seen = True
+                        break
+                    article['begin'] = begin
+                    if not self._put(out_queue, article, stop):
+                        return
+                    listed += 1
+                if reached_seen:
+                    logger.info("已到达上次爬取过的文章，停止翻页")
+                    break
+                # 列表按发布时间从新到旧排列，整页都早于时间范围时后面的页也不需要了
+                if since and all((article.get('create_time') or since) < since for article in articles['list']):
+                    logger.info("文章发布时间已早于时间范围，停止翻页")
+                    break
+                begin += 5
+            if listed >= self.max_articles:
+                logger.info(f"已达到最大文章数量限制: {self.max_articles}")
+            listing['complete'] = not stop.is_set()
+        except Exception as e:
+            self.metrics.inc('errors_total', stage='list')
+            logger.error(f"获取文章列表时发生错误: {e}")
+        finally:
+            self._put(out_queue, _DONE, stop)
+
+    def _in_window(self, article: Dict, since: Optional[float]) -> bool:
+        """文章的发布时间是否在时间范围内，没有发布时间的文章不过滤"""
+        create_time = article.get('create_time')
+        if not create_time:
+            return True
+        if since and create_time < since:
+            return False
+        return not self.until or create_time <= self.until
+
+    def _fetch_stage(self, in_queue: queue.Queue, out_queue: queue.Queue, stop: threading.Event):
+        """下载阶段：把文章提交到线程池下载，按列表顺序传递给解析阶段"""
+        try:
+            while True:
+                article = self._get(in_queue, stop)
+                if article is _DONE:
+                    break
+                future = self.executor.submit(self._fetch_article_html, article['link'])
+                if not self._put(out_queue, (article, future), stop):
+                    return
+        finally:
+            self._put(out_queue, _DONE, stop)
+
+    def _parse_stage(self, account: str, in_queue: queue.Queue, out_queue: queue.Queue, stop: threading.Event):
+        """
+        解析阶段：等待下载结果并转换为 markdown
+        启用转换进程池时把页面交给子进程转换，由写入阶段按顺序等待结果
+        启用去重时先在本线程提取正文并查找相似文章，重复的文章不再转换
+        """
+        try:
+            while True:
+                item = self._get(in_queue, stop)
+                if item is _DONE:
+                    break
+                article, future = item
+                try:
+                    html = future.result()
+                except Exception as e:
+                    logger.error(f"获取文章内容失败: {article['title']}, 错误: {e}")
+                    html = ""
+                if self.dedup and html:
+                    content = self._dedup_or_convert(account, article, html)
+                elif self.convert_pool and html:
+                    content = self.convert_pool.submit(convert_article, html, self.extractor)
+                else:
+                    content = self._parse_article_content(html, article['link'])
+                if not self._put(out_queue, (article, content, None), stop):
+                    return
+        finally:
+            self._put(out_queue, _DONE, stop)
+
+    def _dedup_or_convert(self, account: str, article: Dict, html: str):
+        """
+        提取正文并计算 simhash，与已有文章相近时只保存引用，否则记录指纹后转换
+        指纹在转换前记录，同时处理中的转载文章也能被识别
+        :param account: 公众号名称
+        :param article: 文章数据，重复时加入 duplicate_of
+        :param html: 页面HTML
+        :return: 文章内容，使用转换进程池时为 Future
+        """
+        url = article['link']
+        try:
+            with self.metrics.timer('parse'):
+                content_html = EXTRACTORS[self.extractor](html)
+            if content_html is None:
+                self.metrics.inc('errors_total', stage='parse')
+                logger.error(f"未找到文章内容: {url}")
+                return ""
+            text = content_text(content_html)
+            if len(text) >= self.dedup.min_length:
+                with self.metrics.timer('dedup'):
+                    fingerprint = simhash(text)
+                    original = self.dedup.find(fingerprint, url)
+                if original:
+                    self.metrics.inc('dedup_total', result='duplicate')
+                    logger.info(f"文章与 {original['account']} 的《{original['title']}》相同，只保存引用")
+                    article['duplicate_of'] = original['link']
+                    return f"> 与 {original['account']} 的《{original['title']}》内容相同：{original['link']}"
+                self.metrics.inc('dedup_total', result='unique')
+                self.dedup.add(fingerprint, url, account, article['title'])
+            if self.convert_pool:
+                return self.convert_pool.submit(convert_content, content_html)
+            return self._converted_content(convert_content(content_html), url)
+        except Exception as e:
+            self.metrics.inc('errors_total', stage='parse')
+            logger.error(f"处理文章内容时发生错误: {url}, 错误: {e}")
+            return ""
+
+    def _asset_stage(self, in_queue: queue.Queue, out_queue: queue.Queue, stop: threading.Event):
+        """
+        资源阶段：找出文章中的图片并提交并发下载，由写入阶段等待下载完成后改写为本地路径
+        """
+        try:
+            while True:
+                item = self._get(in_queue, stop)
+                if item is _DONE:
+                    break
+                article, content, _ = item
+                if isinstance(content, Future):
+                    content = self._wait_converted(content, article['link'])
+                downloads = {url: self._submit_asset(url) for url in find_image_urls(content)}
+                if not self._put(out_queue, (article, content, downloads), stop):
+                    return
+        finally:
+            self._put(out_queue, _DONE, stop)
+
+    def _submit_asset(self, url: str) -> Future:
+        """
+        提交图片下载，同一地址正在下载时复用已有的任务
+        :param url: 图片地址
+        :return: 结果为本地文件路径的 Future
+        """
+        with self.asset_lock:
+            future = self.asset_downloads.get(url)
+            if future is not None:
+                return future
+            future = self.asset_downloads[url] = self.asset_executor.submit(self._download_asset, url)
+        # 已完成的任务会在当前线程立即执行回调，所以在锁外注册
+        future.add_done_callback(lambda _: self._forget_asset(url))
+        return future
+
+    def _forget_asset(self, url: str):
+        """下载结束后不再保留任务，之后的请求从 AssetStore 的记录中查找"""
+        with self.asset_lock:
+            self.asset_downloads.pop(url, None)
+
+    def _download_asset(self, url: str) -> Path:
+        """
+        下载图片，已下载过的地址直接返回本地文件
+        :param url: 图片地址
+        :return: 本地文件路径
+        """
+        path = self.assets.get(url)
+        if path:
+            self.metrics.inc('assets_total', result='hit')
+            return path
+        self.asset_throttle.bucket.acquire()
+        _, response, _ = self._controlled_get(url, 'asset', throttle=self.asset_throttle, stage='asset')
+        response.raise_for_status()
+        path, created = self.assets.put(url, response.content, response.headers.get('Content-Type', ''))
+        self.metrics.inc('assets_total', result='downloaded' if created else 'duplicate')
+        return path
+
+    def _localize_assets(self, content: str, downloads: Dict[str, Future]) -> str:
+        """
+        等待图片下载完成，把内容中的图片地址改为相对输出目录的本地路径，下载失败的图片保留原地址
+        :param content: 文章内容
+        :param downloads: 图片地址到下载任务的映射
+        :return: 改写后的文章内容
+        """
+        for url, future in downloads.items():
+            try:
+                path = future.result()
+            except Exception as e:
+                self.metrics.inc('errors_total', stage='asset')
+                logger.error(f"下载图片失败: {url}, 错误: {e}")
+                continue
+            local = Path(os.path.relpath(path, self.output_dir)).as_posix()
+            content = content.replace(f']({url})', f']({local})')
+        return content
 
-    def _get_articles_batch(self, fakeid: str, token: str, cookies: Dict[str, str], begin: int) -> Optional[Dict]:
+    def _get_articles_batch(self, fakeid: str, begin: int) -> Optional[Dict]:
         """
         获取一批文章
         :param fakeid: 公众号的fakeid
-        :param token: 访问令牌
-        :param cookies: cookies
         :param begin: 开始位置
         :return: 包含文章列表和总数的字典
         """
@@ -416,15 +3167,13 @@ class WeixinCrawler:
             'type': '101_1',
             'free_publish_type': '1',
             'sub_action': 'list_ex',
-            'token': token,
             'lang': 'zh_CN',
             'f': 'json',
             'ajax': '1'
         }
         
         try:
-            response = requests.get(url, cookies=cookies, headers=self.headers, params=params)
-            data = response.json()
+            data = self._api_get(url, params, stage='list')
             
             # 添加响应检查和日志
             if 'base_resp' in data and data['base_resp'].get('ret') != 0:
@@ -432,17 +3181,22 @@ class WeixinCrawler:
                 return None
             
             articles = []
-            publish_page = eval(data.get('publish_page', {}))
+            publish_page = json.loads(data.get('publish_page') or '{}')
             
             for page in publish_page.get('publish_list', []):
-                # print(f" type of page: {type(page)}, page: {page}")
                 if page:
-                    publish_info = json.loads(page.get('publish_info', {}))
+                    publish_info = json.loads(page.get('publish_info') or '{}')
                     appmsgex = publish_info.get('appmsgex', [])
                     for article in appmsgex:
                         article_data = {
                             'title': article.get('title', ''),
                             'link': article.get('link', ''),
+                            'author': article.get('author_name', ''),
+                            'digest': article.get('digest', ''),
+                            'cover': article.get('cover', ''),
+                            'create_time': article.get('create_time'),
+                            'update_time': article.get('update_time'),
+                            'idx': article.get('itemidx'),
                         }
                         articles.append(article_data)
                         logger.info(f"获取到文章: {article_data['title']}")
@@ -462,46 +3216,57 @@ class WeixinCrawler:
             logger.error(f"获取文章批次时发生未知错误: {e}")
             return None
 
-    def _get_article_content(self, url: str, cookies: Dict[str, str]) -> str:
+    def _get_article_content(self, url: str) -> str:
         """
         获取文章内容
         :param url: 文章链接
-        :param cookies: cookies字典
         :return: 文章内容
         """
+        return self._parse_article_content(self._fetch_article_html(url), url)
+
+    def _fetch_article_html(self, url: str) -> str:
+        """
+        下载文章页面
+        :param url: 文章链接
+        :return: 页面HTML，失败时返回空字符串
+        """
         try:
             # 处理URL中的转义字符
             url = url.replace('\\/', '/')
             
-            # 构建请求头
-            headers = self.headers.copy()
-            headers['Host'] = 'mp.weixin.qq.com'
-            headers['Upgrade-Insecure-Requests'] = '1'
+            # 构建请求头，Host 由文章链接决定
+            headers = {
+                'Upgrade-Insecure-Requests': '1'
+            }
+            
+            # 优先使用缓存，过期的缓存向服务器协商是否有更新
+            cached = self.cache.get(url) if self.cache else None
+            if cached:
+                if cached['fresh']:
+                    self.metrics.inc('cache_total', result='hit')
+                    return cached['body']
+                if cached['etag']:
+                    headers['If-None-Match'] = cached['etag']
+                if cached['last_modified']:
+                    headers['If-Modified-Since'] = cached['last_modified']
             
-            # 发送请求获取文章内容
-            response = requests.get(url, cookies=cookies, headers=headers, timeout=20)
+            # 发送请求获取文章内容，fetch 阶段只统计网络耗时
+            _, response, _ = self._controlled_get(url, 'article', stage='fetch', headers=headers)
+            if cached and response.status_code == 304:
+                self.metrics.inc('cache_total', result='revalidated')
+                self.cache.revalidated(url)
+                return cached['body']
+            if response.status_code >= 400:
+                self.metrics.inc('errors_total', stage='fetch')
             response.raise_for_status()  # 检查响应状态
             response.encoding = 'utf-8'
-            
-            # 使用 BeautifulSoup 解析内容
-            soup = BeautifulSoup(response.text, 'html.parser')
-            article_element = soup.find(class_="rich_media_content")
-            
-            if not article_element:
-                logger.error(f"未找到文章内容: {url}")
-                return ""
-                
-            # 移除脚本和样式
-            for script in article_element(["script", "style"]):
-                script.decompose()
-            
-            # 使用 html2text 转换为 markdown 格式文本
-            h = html2text.HTML2Text()
-            h.ignore_links = False
-            h.ignore_images = False
-            text_content = h.handle(str(article_element))
-            
-            return text_content.strip()
+            if self.cache:
+                self.metrics.inc('cache_total', result='miss')
+            # 只缓存有正文的页面，环境异常和文章已删除等页面下次重新请求
+            if self.cache and has_article_content(response.text):
+                self.cache.put(url, response.text, response.headers.get('ETag'),
+                               response.headers.get('Last-Modified'))
+            return response.text
             
         except requests.Timeout:
             logger.error(f"请求文章超时: {url}")
@@ -509,28 +3274,332 @@ class WeixinCrawler:
         except requests.RequestException as e:
             logger.error(f"请求文章失败: {url}, 错误: {e}")
             return ""
+
+    def _parse_article_content(self, html: str, url: str) -> str:
+        """
+        从文章页面中提取正文并转换为 markdown
+        :param html: 页面HTML
+        :param url: 文章链接，用于日志
+        :return: 文章内容
+        """
+        if not html:
+            return ""
+        try:
+            return self._converted_content(convert_article(html, self.extractor), url)
+        except Exception as e:
+            self.metrics.inc('errors_total', stage='parse')
+            logger.error(f"处理文章内容时发生错误: {url}, 错误: {e}")
+            return ""
+
+    def _wait_converted(self, future: Future, url: str) -> str:
+        """
+        等待转换进程池的结果
+        :param future: convert_article 的 Future
+        :param url: 文章链接，用于日志
+        :return: 文章内容
+        """
+        try:
+            return self._converted_content(future.result(), url)
         except Exception as e:
+            self.metrics.inc('errors_total', stage='parse')
             logger.error(f"处理文章内容时发生错误: {url}, 错误: {e}")
             return ""
 
+    def _converted_content(self, result: Tuple[Optional[str], Optional[float], float], url: str) -> str:
+        """记录 convert_article 的耗时并返回文章内容"""
+        content, parse_seconds, convert_seconds = result
+        if parse_seconds is not None:
+            self.metrics.observe('stage_seconds', parse_seconds, stage='parse')
+        if content is None:
+            self.metrics.inc('errors_total', stage='parse')
+            logger.error(f"未找到文章内容: {url}")
+            return ""
+        self.metrics.observe('stage_seconds', convert_seconds, stage='convert')
+        return content
+
     def run(self):
         """运行爬虫"""
-        if not self.login():
+        # 验证cookies时通常已经拿到token，这里不会重复请求
+        for credential in self.credentials.credentials:
+            if not self.login(credential.manager) or not credential.manager.get_token():
+                logger.error(f"登录账号 {credential.name} 登录失败")
+                credential.expired = True
+        if all(credential.expired for credential in self.credentials.credentials):
             logger.error("登录失败")
             return
             
-        for account in self.account_list:
-            logger.info(f"开始爬取公众号：{account}")
-            if self.crawl_articles(account):
-                logger.info(f"公众号 {account} 爬取完成")
+        if self.metrics_port:
+            self.metrics.serve(self.metrics_port)
+            
+        try:
+            if self.work_queue:
+                # 公众号由多个进程分摊，只解析领取到的公众号的fakeid
+                self._run_work_queue()
+            elif self.scheduler:
+                self._warm_fakeid_cache()
+                self._run_daemon()
+            elif self.account_workers > 1:
+                self._warm_fakeid_cache()
+                # 多个公众号并行爬取，共享登录账号池和限流配额
+                with ThreadPoolExecutor(max_workers=self.account_workers) as pool:
+                    list(pool.map(self._crawl_account, self.account_list))
             else:
-                logger.error(f"公众号 {account} 爬取失败")
+                self._warm_fakeid_cache()
+                for account in self.account_list:
+                    self._crawl_account(account)
+        finally:
+            self.credentials.flush()
+            self.executor.shutdown()
+            logger.info(f"运行统计:\n{self.metrics.summary()}")
+            if len(self.credentials.credentials) > 1:
+                logger.info(f"账号状态: {self.credentials.status()}")
+            if self.metrics_file:
+                self.metrics.write(self.metrics_file)
+            self.metrics.dump_profiles(self.profile_dir)
+            if self.convert_pool:
+                self.convert_pool.shutdown()
+            if self.state:
+                self.state.close()
+            if self.cache:
+                self.cache.close()
+            if self.work_queue:
+                self.work_queue.close()
+            if self.asset_executor:
+                self.asset_executor.shutdown()
+            if self.assets:
+                self.assets.close()
+            if self.dedup:
+                self.dedup.close()
+            if self.search_index:
+                self.search_index.close()
+
+    def _run_daemon(self):
+        """
+        常驻运行：保持登录状态，按轮询计划反复爬取各公众号，直到调用 stop 或收到 SIGTERM
+        同时到期的公众号按预计新文章数排序，最多 account_workers 个同时轮询，请求仍受全局限流约束
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        logger.info(f"常驻运行，共 {len(self.account_list)} 个公众号")
+        running: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=self.account_workers) as pool:
+            try:
+                while not self.stopping.is_set():
+                    for future in [future for future in running if future.done()]:
+                        running.pop(future)
+                    for account in self.scheduler.due()[:self.account_workers - len(running)]:
+                        self.scheduler.start(account)
+                        running[pool.submit(self._poll_account, account)] = account
+                    # 最多等待一分钟，以便及时发现结束的轮询和新到期的公众号
+                    next_due = self.scheduler.next_due()
+                    delay = 60 if next_due is None else next_due - time.time()
+                    self.stopping.wait(min(max(delay, 1), 60))
+            except KeyboardInterrupt:
+                logger.info("收到中断信号")
+            finally:
+                # 正在进行的轮询结束后退出
+                self.stopping.set()
+                logger.info("等待正在进行的轮询结束")
+
+    def _poll_account(self, account: str):
+        """轮询一个公众号，并根据列表中文章的发布时间更新轮询计划"""
+        listing = {}
+        success = False
+        try:
+            success = self._crawl_account(account, listing)
+        finally:
+            self.scheduler.record(account, listing.get('publish_times', []),
+                                  bool(success and listing.get('complete')))
+
+    def stop(self):
+        """停止常驻运行"""
+        logger.info("正在停止常驻运行")
+        self.stopping.set()
+
+    def _run_work_queue(self):
+        """
+        从共享的任务队列领取公众号爬取，直到所有公众号完成或失败
+        多个进程使用同一队列时各自把 account_list 加入队列，已有的公众号不会重复加入
+        """
+        self.work_queue.add(self.account_list)
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_leases, args=(stop,), daemon=True)
+        heartbeat.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.account_workers) as pool:
+                list(pool.map(self._queue_worker, range(self.account_workers)))
+        finally:
+            stop.set()
+            heartbeat.join()
+        logger.info(f"任务队列状态: {self.work_queue.counts()}")
+
+    def _queue_worker(self, index: int):
+        """
+        循环领取并爬取公众号，队列中暂时没有可领取的公众号但其他进程还在处理时等待，
+        以便接管崩溃进程过期的租约
+        :param index: 本进程内的线程序号
+        """
+        worker = f'{self.worker_id}-{index}'
+        while True:
+            with self.leases_lock:
+                released = self.leases_released
+            account = self.work_queue.lease(worker, self.lease_ttl)
+            if account is None:
+                if not self.work_queue.unfinished():
+                    return
+                # 本进程其他线程的租约结束时立即重新检查，否则定期检查其他进程的租约是否过期
+                with self.leases_lock:
+                    self.leases_lock.wait_for(lambda: self.leases_released != released, min(self.lease_ttl / 3, 10))
+                continue
+            self.metrics.inc('leases_total')
+            with self.leases_lock:
+                self.leases[account] = worker
+            try:
+                success = self._crawl_account(account)
+            except Exception as e:
+                logger.error(f"爬取公众号 {account} 时发生错误: {e}")
+                success = False
+            finally:
+                with self.leases_lock:
+                    self.leases.pop(account, None)
+            if success:
+                if not self.work_queue.complete(account, worker):
+                    logger.warning(f"公众号 {account} 的租约已被其他进程接管，结果仍标记为完成")
+            else:
+                self.work_queue.fail(account, worker, '爬取失败')
+            with self.leases_lock:
+                self.leases_released += 1
+                self.leases_lock.notify_all()
+
+    def _heartbeat_leases(self, stop: threading.Event):
+        """定期为正在爬取的公众号续约"""
+        while not stop.wait(self.lease_ttl / 3):
+            with self.leases_lock:
+                leases = list(self.leases.items())
+            for account, worker in leases:
+                try:
+                    if not self.work_queue.heartbeat(account, worker, self.lease_ttl):
+                        logger.warning(f"公众号 {account} 的租约已过期，可能已被其他进程接管")
+                except Exception as e:
+                    logger.error(f"公众号 {account} 续约失败: {e}")
+
+    def _crawl_account(self, account: str, listing: Dict = None) -> bool:
+        """
+        爬取单个公众号并记录结果
+        :param account: 公众号名称
+        :param listing: 传给 crawl_articles，记录列表的结果
+        :return: 是否成功爬取
+        """
+        logger.info(f"开始爬取公众号：{account}")
+        if self.crawl_articles(account, listing):
+            logger.info(f"公众号 {account} 爬取完成")
+            return True
+        logger.error(f"公众号 {account} 爬取失败")
+        return False
+
+def search_main(argv: List[str] = None):
+    """
+    命令行查询全文索引：python weixin.py search 关键词 [--account 公众号] [--since 2024-01-01]
+    """
+    parser = argparse.ArgumentParser(prog='weixin.py search', description='搜索已爬取的文章')
+    parser.add_argument('query', nargs='+', help='关键词，多个关键词需要同时出现')
+    parser.add_argument('--index', default=os.getenv('SEARCH_INDEX') or 'search_index.db', help='全文索引数据库')
+    parser.add_argument('--account', help='只搜索该公众号')
+    parser.add_argument('--since', help='只搜索该时间及之后发布的文章，时间戳或 YYYY-MM-DD[ HH:MM[:SS]]')
+    parser.add_argument('--until', help='只搜索该时间及之前发布的文章')
+    parser.add_argument('--limit', type=int, default=20, help='最多返回的文章数')
+    parser.add_argument('--json', action='store_true', help='以 JSON Lines 输出')
+    args = parser.parse_args(argv)
+    if not Path(args.index).exists():
+        parser.error(f"全文索引不存在: {args.index}，请先设置 SEARCH_INDEX 运行爬虫")
+    index = SearchIndex(args.index)
+    try:
+        start = time.perf_counter()
+        results = index.search(' '.join(args.query), args.account, parse_time(args.since), parse_time(args.until),
+                               args.limit)
+        elapsed = time.perf_counter() - start
+    finally:
+        index.close()
+    for result in results:
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False))
+            continue
+        published = time.strftime('%Y-%m-%d', time.localtime(result['create_time'])) if result['create_time'] else '-'
+        print(f"{published} [{result['account']}] {result['title']}\n  {result['link']}\n  {result['snippet']}\n")
+    if not args.json:
+        print(f"共 {len(results)} 条结果，耗时 {elapsed * 1000:.1f} 毫秒")
+
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'search':
+        search_main(sys.argv[2:])
+        sys.exit(0)
+        
     # 从环境变量获取配置
     account_list = os.getenv('ACCOUNT_LIST', '极客时间').split(',')
     max_articles = int(os.getenv('MAX_ARTICLES', '10'))
+    pool_size = int(os.getenv('POOL_SIZE', '10'))
+    timeout = float(os.getenv('REQUEST_TIMEOUT', '20'))
+    workers = int(os.getenv('WORKERS', '4'))
+    rate = float(os.getenv('RATE_LIMIT', '1'))
+    host_rate = float(os.getenv('HOST_RATE_LIMIT', '0')) or None
+    queue_size = int(os.getenv('QUEUE_SIZE', '10'))
+    account_workers = int(os.getenv('ACCOUNT_WORKERS', '1'))
+    state_file = os.getenv('STATE_FILE', 'crawl_state.db')
+    cache_dir = os.getenv('CACHE_DIR') or None
+    cache_max_bytes = int(os.getenv('CACHE_MAX_MB', '1024')) * 1024 * 1024
+    cache_ttl = float(os.getenv('CACHE_TTL', '0')) or None
+    extractor = os.getenv('EXTRACTOR', 'auto')
+    convert_workers = int(os.getenv('CONVERT_WORKERS', '0'))
+    fakeid_cache_file = os.getenv('FAKEID_CACHE_FILE', 'fakeid_cache.json')
+    account_select = os.getenv('ACCOUNT_SELECT', 'auto')
+    search_rate = float(os.getenv('SEARCH_RATE_LIMIT', '0.2'))
+    cookie_save_interval = float(os.getenv('COOKIE_SAVE_INTERVAL', '10'))
+    output_format = os.getenv('OUTPUT_FORMAT', 'csv')
+    output_compression = os.getenv('OUTPUT_COMPRESSION') or None
+    output_dir = os.getenv('OUTPUT_DIR', '.')
+    flush_rows = int(os.getenv('FLUSH_ROWS', '20'))
+    flush_interval = float(os.getenv('FLUSH_INTERVAL', '5'))
+    metrics_file = os.getenv('METRICS_FILE') or None
+    metrics_port = int(os.getenv('METRICS_PORT', '0')) or None
+    profile_stages = [stage for stage in os.getenv('PROFILE_STAGES', '').split(',') if stage]
+    max_rate = float(os.getenv('MAX_RATE_LIMIT', '0')) or None
+    max_retries = int(os.getenv('MAX_RETRIES', '5'))
+    cookie_files = [path for path in os.getenv('COOKIE_FILES', '').split(',') if path] or None
+    credential_rate = float(os.getenv('CREDENTIAL_RATE_LIMIT', '0')) or None
+    work_queue = os.getenv('WORK_QUEUE') or None
+    work_queue_backend = os.getenv('WORK_QUEUE_BACKEND', 'sqlite')
+    lease_ttl = float(os.getenv('LEASE_TTL', '300'))
+    max_attempts = int(os.getenv('MAX_ATTEMPTS', '3'))
+    since = os.getenv('SINCE') or None
+    until = os.getenv('UNTIL') or None
+    since_last_run = os.getenv('SINCE_LAST_RUN', '').lower() in ('1', 'true', 'yes')
+    asset_dir = os.getenv('ASSET_DIR') or None
+    asset_workers = int(os.getenv('ASSET_WORKERS', '8'))
+    dedup_file = os.getenv('DEDUP_FILE') or None
+    dedup_distance = int(os.getenv('DEDUP_DISTANCE', '3'))
+    daemon = os.getenv('DAEMON', '').lower() in ('1', 'true', 'yes')
+    poll_min_interval = float(os.getenv('POLL_MIN_INTERVAL', '600'))
+    poll_max_interval = float(os.getenv('POLL_MAX_INTERVAL', '86400'))
+    poll_factor = float(os.getenv('POLL_FACTOR', '0.5'))
+    search_index = os.getenv('SEARCH_INDEX') or None
     
     # 创建爬虫实例并运行
-    crawler = WeixinCrawler(account_list, max_articles=max_articles)
+    crawler = WeixinCrawler(account_list, max_articles=max_articles, pool_size=pool_size, timeout=timeout,
+                            workers=workers, rate=rate, host_rate=host_rate, queue_size=queue_size,
+                            account_workers=account_workers, state_file=state_file,
+                            cache_dir=cache_dir, cache_max_bytes=cache_max_bytes, cache_ttl=cache_ttl,
+                            extractor=extractor, convert_workers=convert_workers,
+                            fakeid_cache_file=fakeid_cache_file, account_select=account_select,
+                            search_rate=search_rate, cookie_save_interval=cookie_save_interval,
+                            output_format=output_format, output_compression=output_compression,
+                            output_dir=output_dir, flush_rows=flush_rows, flush_interval=flush_interval,
+                            metrics_file=metrics_file, metrics_port=metrics_port, profile_stages=profile_stages,
+                            max_rate=max_rate, max_retries=max_retries, cookie_files=cookie_files,
+                            credential_rate=credential_rate, work_queue=work_queue,
+                            work_queue_backend=work_queue_backend, lease_ttl=lease_ttl, max_attempts=max_attempts,
+                            since=since, until=until, since_last_run=since_last_run,
+                            asset_dir=asset_dir, asset_workers=asset_workers, dedup_file=dedup_file,
+                            dedup_distance=dedup_distance, daemon=daemon, poll_min_interval=poll_min_interval,
+                            poll_max_interval=poll_max_interval, poll_factor=poll_factor, search_index=search_index)
     crawler.run()